@@ -0,0 +1,112 @@
+"""
+Multi-process read contention benchmark for JsonRepository.
+
+Every worker process searches the same collection in a loop while a
+writer process keeps adding records. Reads per second are reported for
+each worker count, using shared reader locks and, for comparison, with
+every lock forced to be exclusive.
+
+    python benchmarks/json_repository_contention.py --records 2000
+"""
+import time
+import fcntl
+import asyncio
+import argparse
+import tempfile
+import multiprocessing
+from contextlib import contextmanager
+from modelark.common import Entity
+from modelark.repository import JsonRepository, json_repository
+
+
+def build(data_path: str) -> JsonRepository:
+    return JsonRepository(data_path, 'entities', Entity)
+
+
+def exclusive_locks() -> None:
+    @contextmanager
+    def locked_open(filename, mode='r'):
+        with open(filename, mode) as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            yield file
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+    json_repository.locked_open = locked_open
+
+
+def read(data_path, exclusive, duration, start, counter) -> None:
+    if exclusive:
+        exclusive_locks()
+    repository = build(data_path)
+
+    async def run() -> int:
+        reads = 0
+        start.wait()
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            await repository.search([('status', '=', 'active')])
+            reads += 1
+        return reads
+
+    reads = asyncio.run(run())
+    with counter.get_lock():
+        counter.value += reads
+
+
+def write(data_path, exclusive, duration, start) -> None:
+    if exclusive:
+        exclusive_locks()
+    repository = build(data_path)
+
+    async def run() -> None:
+        start.wait()
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            await repository.add(Entity(status='active'))
+            await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+
+
+def measure(data_path, workers, exclusive, duration) -> float:
+    start = multiprocessing.Event()
+    counter = multiprocessing.Value('q', 0)
+    processes = [multiprocessing.Process(
+        target=read, args=(data_path, exclusive, duration, start, counter))
+        for _ in range(workers)]
+    processes.append(multiprocessing.Process(
+        target=write, args=(data_path, exclusive, duration, start)))
+
+    for process in processes:
+        process.start()
+    start.set()
+    for process in processes:
+        process.join()
+
+    return counter.value / duration
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--records', type=int, default=2000)
+    parser.add_argument('--duration', type=float, default=3.0)
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=[1, 2, 4, 8])
+    arguments = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_path:
+        asyncio.run(build(data_path).add([
+            Entity(status='active') for _ in range(arguments.records)]))
+
+        print(f"{'workers':>8} {'shared reads/s':>16} "
+              f"{'exclusive reads/s':>18}")
+        for workers in arguments.workers:
+            shared = measure(
+                data_path, workers, False, arguments.duration)
+            exclusive = measure(
+                data_path, workers, True, arguments.duration)
+            print(f"{workers:>8} {shared:>16.1f} {exclusive:>18.1f}")
+
+
+if __name__ == '__main__':
+    main()
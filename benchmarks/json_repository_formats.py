@@ -0,0 +1,67 @@
+"""
+On-disk format benchmark for JsonRepository.
+
+A collection of generated records is written and read back in every
+format, reporting the file size, the write latency (encoding and
+replacing the collection file) and the read latency (loading and
+decoding it without cache).
+
+    python benchmarks/json_repository_formats.py --records 10000 100000
+"""
+import time
+import argparse
+import tempfile
+from modelark.common import Entity
+from modelark.repository import JsonRepository
+
+
+FORMATS = ['json', 'compact', 'gzip', 'lzma', 'pickle', 'marshal']
+
+
+def generate(records: int) -> dict:
+    return {'entities': {str(index): vars(Entity(
+        id=str(index), status=('active', 'inactive')[index % 2],
+        created_at=1_600_000_000 + index, created_by='benchmark',
+        updated_at=1_600_000_000 + index, updated_by='benchmark'))
+        for index in range(records)}}
+
+
+def measure(data_path: str, data: dict, format: str, repeat: int):
+    repository = JsonRepository(data_path, format, Entity, format=format)
+    repository.file_path.parent.mkdir(parents=True, exist_ok=True)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        repository._write(data)
+    write = (time.perf_counter() - start) / repeat
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        repository._load()
+    read = (time.perf_counter() - start) / repeat
+
+    return repository.file_path.stat().st_size, write, read
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--records', type=int, nargs='+',
+                        default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--formats', nargs='+', default=FORMATS)
+    parser.add_argument('--repeat', type=int, default=3)
+    arguments = parser.parse_args()
+
+    print(f"{'records':>9} {'format':>8} {'size MB':>9} "
+          f"{'write ms':>10} {'read ms':>10}")
+    for records in arguments.records:
+        data = generate(records)
+        with tempfile.TemporaryDirectory() as data_path:
+            for format in arguments.formats:
+                size, write, read = measure(
+                    data_path, data, format, arguments.repeat)
+                print(f"{records:>9} {format:>8} {size / 1e6:>9.2f} "
+                      f"{write * 1e3:>10.1f} {read * 1e3:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,15 @@
-from typing import Protocol, List, Mapping
+from typing import (
+    Protocol, List, Mapping, AsyncContextManager, Iterable, Sequence)
+
+
+class Statement(Protocol):
+    async def fetch(self, *args, **kwargs) -> List[Mapping]:
+        """Fetch the prepared statement records"""
+
+
+class Cursor(Protocol):
+    async def fetch(self, n: int, *args, **kwargs) -> List[Mapping]:
+        """Fetch the next n records of the server-side cursor"""
 
 
 class Connection(Protocol):
@@ -7,3 +18,17 @@ class Connection(Protocol):
 
     async def fetch(self, query: str, *args, **kwargs) -> List[Mapping]:
         """Fetch the given query records"""
+
+    async def prepare(self, query: str, *args, **kwargs) -> Statement:
+        """Prepare a server-side statement for the given query"""
+
+    async def cursor(self, query: str, *args, **kwargs) -> Cursor:
+        """Open a server-side cursor for the given query"""
+
+    def transaction(self, *args, **kwargs) -> AsyncContextManager:
+        """Transaction context, required by the server-side cursors"""
+
+    async def copy_records_to_table(
+            self, table_name: str, *, records: Iterable[Sequence],
+            **kwargs) -> str:
+        """Copy the records into the table with a binary COPY"""
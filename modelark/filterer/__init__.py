@@ -1,4 +1,7 @@
+from .analyzer import *
 from .function_parser import *
+from .parse_cache import *
 from .safe_eval import *
 from .sql_parser import *
+from .sqlite_parser import *
 from .types import *
@@ -0,0 +1,96 @@
+from typing import Callable, List, Set, Tuple, Union, cast
+from .types import QueryDomain, TermTuple
+
+
+def conjuncts(domain: QueryDomain) -> List[TermTuple]:
+    """Terms that must all hold for the domain to match"""
+    if not domain:
+        return []
+
+    stack: List[List[TermTuple]] = []
+    for item in list(reversed(domain)):
+        if item == '&':
+            first_operand = stack.pop()
+            second_operand = stack.pop()
+            stack.append(first_operand + second_operand)
+        elif item == '|':
+            stack.pop()
+            stack.pop()
+            stack.append([])
+        elif item == '!':
+            stack.pop()
+            stack.append([])
+
+        if len(stack) == 2:
+            first_operand = stack.pop()
+            second_operand = stack.pop()
+            stack.append(first_operand + second_operand)
+
+        if isinstance(item, (list, tuple)):
+            field, operator, value = item
+            stack.append([(field, operator, value)])
+
+    if len(stack) == 2:
+        first_operand = stack.pop()
+        second_operand = stack.pop()
+        stack.append(first_operand + second_operand)
+
+    return stack[0]
+
+
+def split(domain: QueryDomain, predicate: Callable[[TermTuple], bool]
+          ) -> Tuple[List[TermTuple], List[Union[str, TermTuple]]]:
+    """Take the conjunct terms satisfying the predicate out of a domain"""
+    if not domain:
+        return [], []
+
+    stack: List[Tuple] = []
+    position = len(domain)
+    for item in list(reversed(domain)):
+        position -= 1
+        if item in ('&', '|'):
+            first_operand = stack.pop()
+            second_operand = stack.pop()
+            stack.append((item, position, first_operand, second_operand))
+        elif item == '!':
+            stack.append((item, position, stack.pop()))
+
+        if len(stack) == 2:
+            first_operand = stack.pop()
+            second_operand = stack.pop()
+            stack.append(('&', None, first_operand, second_operand))
+
+        if isinstance(item, (list, tuple)):
+            stack.append(('', position))
+
+    if len(stack) == 2:
+        first_operand = stack.pop()
+        second_operand = stack.pop()
+        stack.append(('&', None, first_operand, second_operand))
+
+    removed: Set[int] = set()
+
+    def prune(node: Tuple) -> bool:
+        """Remove the matching conjuncts below the node, telling whether
+        the whole node was removed"""
+        operator, position, *operands = node
+        if not operator:
+            if predicate(domain[position]):
+                removed.add(position)
+                return True
+            return False
+        if operator != '&':
+            return False
+        pruned = [prune(operand) for operand in operands]
+        if any(pruned) and position is not None:
+            removed.add(position)
+        return all(pruned)
+
+    prune(stack[0])
+
+    taken = [cast(TermTuple, domain[position]) for position in sorted(
+        removed) if not isinstance(domain[position], str)]
+    remaining = [item for position, item in enumerate(domain)
+                 if position not in removed]
+
+    return taken, remaining
@@ -1,14 +1,20 @@
+import re
 import operator
-from typing import List, Union, Callable, Any, Dict, Tuple
+from keyword import iskeyword
+from typing import List, Union, Callable, Any, Dict, Tuple, cast
 from types import SimpleNamespace
-from fnmatch import fnmatchcase
+from fnmatch import fnmatchcase, translate
 from .types import TermTuple, QueryDomain
+from .parse_cache import ParseCache, fingerprint
 
 
 class FunctionParser:
 
-    def __init__(self, evaluator: Callable = lambda x, _: x) -> None:
+    def __init__(self, evaluator: Callable = lambda x, _: x,
+                 compiled: bool = False, cache_size: int = 0) -> None:
         self.evaluator = evaluator
+        self.compiled = compiled
+        self.cache = ParseCache(cache_size) if cache_size else None
 
         self.comparison_dict = {
             '=': operator.eq,
@@ -35,6 +41,19 @@ class FunctionParser:
                 lambda obj: (not expression_1(obj)))
         }
 
+        self.source_dict = {
+            '=': '{0} == {1}',
+            '!=': '{0} != {1}',
+            '<=': '{0} <= {1}',
+            '<': '{0} < {1}',
+            '>': '{0} > {1}',
+            '>=': '{0} >= {1}',
+            'in': '{1}({0})',
+            'like': 'isinstance({0}, str) and {1}({0}) is not None',
+            'ilike': 'isinstance({0}, str) and {1}({0}.lower()) is not None',
+            'contains': '{1} in {0}'
+        }
+
         self.default_join_operator = '&'
 
     def parse(self, domain: QueryDomain,
@@ -42,6 +61,8 @@ class FunctionParser:
               namespaces: List[str] = []) -> Callable:
         if not domain:
             return lambda obj: True
+        if self.compiled and not namespaces:
+            return self._compile(domain, context)
         stack: List[Callable] = []
         for item in list(reversed(domain)):
             if isinstance(item, str) and item in self.binary_dict:
@@ -113,6 +134,95 @@ class FunctionParser:
 
         return base_object, field, value
 
+    def _compile(self, domain: QueryDomain,
+                 context: Dict[str, Any] = None) -> Callable:
+        """Flat predicate function for the domain, its values bound outside
+        the generated source so that it can be reused from the cache."""
+        build, key = None, ()
+        if self.cache is not None:
+            key = fingerprint(domain)
+            build = self.cache.get(key)
+        if build is None:
+            build = self._build_factory(self._compile_source(domain))
+            if self.cache is not None:
+                self.cache.put(key, build)
+
+        return build(*[
+            self._prepare_value(item[1], self.evaluator(item[2], context))
+            for item in reversed(domain) if isinstance(item, (list, tuple))])
+
+    def _compile_source(self, domain: QueryDomain) -> Tuple[str, int]:
+        index = 0
+        stack: List[Tuple[str, str]] = []
+        for item in list(reversed(domain)):
+            if isinstance(item, str) and item in self.binary_dict:
+                first_operand = stack.pop()
+                second_operand = stack.pop()
+                stack.append(self._join_source(
+                    item, first_operand, second_operand))
+            elif isinstance(item, str) and item in self.unary_dict:
+                _, source = stack.pop()
+                stack.append(('!', f'not ({source})'))
+
+            stack = self._default_join_source(stack)
+
+            if isinstance(item, (list, tuple)):
+                stack.append(('', self._compile_term(
+                    cast(TermTuple, item), index)))
+                index += 1
+
+        _, expression = self._default_join_source(stack)[0]
+        return expression, index
+
+    def _default_join_source(
+            self, stack: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        if len(stack) == 2:
+            first_operand = stack.pop()
+            second_operand = stack.pop()
+            stack.append(self._join_source(
+                self.default_join_operator, first_operand, second_operand))
+        return stack
+
+    @staticmethod
+    def _join_source(operator: str, *operands: Tuple[str, str]
+                     ) -> Tuple[str, str]:
+        keyword = {'&': 'and', '|': 'or'}[operator]
+        sources = [source if kind in ('', '!', operator) else f'({source})'
+                   for kind, source in operands]
+        return operator, f' {keyword} '.join(sources)
+
+    def _compile_term(self, term_tuple: TermTuple, index: int) -> str:
+        field, operator, _ = term_tuple
+        template = self.source_dict[operator]
+        attribute = (f'obj.{field}' if field.isidentifier() and
+                     not iskeyword(field) else f'getattr(obj, {field!r})')
+        return '({0})'.format(template.format(attribute, f'_v{index}'))
+
+    @staticmethod
+    def _prepare_value(operator: str, value: Any) -> Any:
+        if operator == 'in':
+            return membership(value)
+        if operator in ('like', 'ilike'):
+            pattern = value.replace('%', '*').replace('_', '?')
+            pattern = pattern.lower() if operator == 'ilike' else pattern
+            return re.compile(translate(pattern)).match
+        return value
+
+    @staticmethod
+    def _build_factory(source_tuple: Tuple[str, int]) -> Callable:
+        expression, count = source_tuple
+        names = ', '.join(f'_v{index}' for index in range(count))
+        source = (
+            f"def build({names}):\n"
+            f"    def predicate(obj):\n"
+            f"        if isinstance(obj, dict):\n"
+            f"            obj = SimpleNamespace(**obj)\n"
+            f"        return {expression}\n"
+            f"    return predicate\n")
+        namespace: Dict[str, Any] = {'SimpleNamespace': SimpleNamespace}
+        exec(compile(source, '<domain>', 'exec'), namespace)
+        return namespace['build']
+
     @staticmethod
     def _parse_like(value: str, pattern: str, insensitive=False) -> bool:
         if not isinstance(value, str):
@@ -131,3 +241,22 @@ class QueryParser(FunctionParser):
 
 class ExpressionParser(FunctionParser):
     """FunctionParser Alias"""
+
+
+def membership(values: Any) -> Callable[[Any], bool]:
+    """Membership test of the 'in' operator, hashing the values when
+    possible and scanning them for unhashable items."""
+    if not isinstance(values, list):
+        return lambda item: False
+    try:
+        hashed = frozenset(values)
+    except TypeError:
+        return lambda item: item in values
+
+    def contains(item: Any) -> bool:
+        try:
+            return item in hashed
+        except TypeError:
+            return item in values
+
+    return contains
@@ -0,0 +1,55 @@
+from threading import Lock
+from collections import OrderedDict
+from typing import Any, Hashable, Tuple
+from .types import QueryDomain
+
+
+class ParseCache:
+    """Bounded, thread-safe LRU cache of parsed domain shapes"""
+
+    def __init__(self, maxsize: int = 512) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = Lock()
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable) -> Any:
+        with self._lock:
+            return self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def fingerprint(domain: QueryDomain) -> Tuple:
+    """Hashable shape of a domain, keeping the value type names but not
+    the values, as the parsed output may depend on them."""
+    return tuple(
+        (item[0], item[1], type(item[2]).__name__)
+        if isinstance(item, (list, tuple)) else item for item in domain)
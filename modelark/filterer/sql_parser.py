@@ -1,15 +1,24 @@
-from typing import List, Dict, Union, Tuple, Any, Callable
+import json
+from typing import List, Dict, Set, Union, Tuple, Any, Callable, cast
 from .types import QueryDomain, TermTuple
+from .parse_cache import ParseCache, fingerprint
+from .analyzer import split
 
 
 class SqlParser:
 
     def __init__(self, evaluator: Callable = lambda x, _: x,
                  placeholder: str = 'numeric',
-                 jsonb_collection: str = '') -> None:
+                 jsonb_collection: str = '',
+                 cache_size: int = 0,
+                 containment: bool = False,
+                 casts: Dict[str, str] = None) -> None:
         self.evaluator = evaluator
         self.placeholder = placeholder
         self.jsonb_collection = jsonb_collection
+        self.cache = ParseCache(cache_size) if cache_size else None
+        self.containment = containment
+        self.casts: Dict[str, str] = casts or {}
 
         self.comparison_dict = {
             '=': lambda x, y:  ' = '.join([str(x), str(y)]),
@@ -21,7 +30,8 @@ class SqlParser:
             'in': lambda x, y: '{0} = ANY({1})'.format(str(x), str(y)),
             'like': lambda x, y: "{0} LIKE {1}".format(str(x), str(y)),
             'ilike': lambda x, y: "{0} ILIKE {1}".format(str(x), str(y)),
-            'contains': lambda x, y: '{0} @> {{{1}}}'.format(str(x), str(y))
+            'contains': lambda x, y: '{0} @> {{{1}}}'.format(str(x), str(y)),
+            '@>': lambda x, y: '{0} @> {1}::jsonb'.format(str(x), str(y))
         }
 
         self.binary_dict = {
@@ -40,14 +50,29 @@ class SqlParser:
             return "1 = 1", ()
 
         jsonb_collection = jsonb_collection or self.jsonb_collection
+        if jsonb_collection and self.containment:
+            domain = self._to_containment_domain(
+                domain, jsonb_collection, context)
+
+        key: Tuple = ()
+        if self.cache is not None:
+            key = (fingerprint(domain), jsonb_collection, tuple(namespaces))
+            condition = self.cache.get(key)
+            if condition is not None:
+                return self._bind(condition, domain, context, namespaces,
+                                  bool(jsonb_collection))
+
+        fields = [''] * len(domain)
         if jsonb_collection:
+            fields = [item[0] if isinstance(item, (list, tuple)) else ''
+                      for item in domain]
             domain = self._to_jsonb_domain(domain, jsonb_collection)
 
         stack: List[str] = []
         params = []
         position = 0
         terms = sum(1 if not isinstance(term, str) else 0 for term in domain)
-        for item in list(reversed(domain)):
+        for field, item in reversed(list(zip(fields, domain))):
             if isinstance(item, str) and item in self.binary_dict:
                 first_operand = stack.pop()
                 second_operand = stack.pop()
@@ -65,7 +90,7 @@ class SqlParser:
 
             if isinstance(item, (list, tuple)):
                 result_tuple = self._parse_term(
-                    item, context, position=terms - position)
+                    item, context, position=terms - position, field=field)
                 stack.append(result_tuple[0])
                 params.append(result_tuple[1])
                 position += 1
@@ -73,6 +98,24 @@ class SqlParser:
         result_query = str(self._default_join(stack)[0])
         result = [result_query, tuple(reversed(params))]
 
+        if namespaces:
+            result.append(", ".join(namespaces))
+
+        if self.cache is not None:
+            self.cache.put(key, result_query)
+
+        return tuple(result)
+
+    def _bind(self, condition: str, domain: QueryDomain,
+              context: Dict[str, Any] = None,
+              namespaces: List[str] = [], jsonb: bool = False) -> Tuple:
+        params = tuple(
+            self._parameter(item[1], self.evaluator(item[2], context)
+                            if isinstance(item[2], str) else item[2],
+                            item[0] if jsonb else '')
+            for item in domain if isinstance(item, (list, tuple)))
+        result = [condition, params]
+
         if namespaces:
             result.append(", ".join(namespaces))
 
@@ -90,25 +133,79 @@ class SqlParser:
 
     def _parse_term(self, term_tuple: TermTuple,
                     context: Dict[str, Any] = None,
-                    position: int = 0) -> Tuple[str, Any]:
-        field, operator, value = term_tuple
+                    position: int = 0, field: str = '') -> Tuple[str, Any]:
+        expression, operator, value = term_tuple
         if isinstance(value, str):
             value = self.evaluator(value, context)
         function = self.comparison_dict[operator]
-        placeholder = (
-            f'${position}' if self.placeholder == 'numeric' else '%s')
-        result = (function(field, placeholder), value)
+        placeholder = {'numeric': f'${position}', 'qmark': '?'}.get(
+            self.placeholder, '%s')
+        result = (function(expression, placeholder),
+                  self._parameter(operator, value, field))
         return result
 
+    def _parameter(self, operator: str, value: Any, field: str = '') -> Any:
+        """Query parameter bound for a term value of the given field"""
+        if operator == '@>':
+            return json.dumps(value)
+        if self.casts.get(field) == 'text':
+            if operator == 'in':
+                return [jsonb_text(item) for item in value]
+            return jsonb_text(value)
+        return value
+
+    def _to_containment_domain(
+            self, domain: QueryDomain, collection: str,
+            context: Dict[str, Any] = None) -> List[Union[str, TermTuple]]:
+        """Fold the first scalar equality of each field into a single
+        containment term over the jsonb collection."""
+        fields: Set[str] = set()
+
+        def foldable(term: TermTuple) -> bool:
+            field, operator, value = term
+            if (operator != '=' or field in fields or not isinstance(
+                    value, (str, int, float, bool))):
+                return False
+            fields.add(field)
+            return True
+
+        taken, remaining = split(domain, foldable)
+        if not taken:
+            return list(domain)
+
+        document = {field: self.evaluator(value, context)
+                    if isinstance(value, str) else value
+                    for field, _, value in taken}
+
+        return [cast(TermTuple, (collection, '@>', document)), *remaining]
+
     def _to_jsonb_domain(self, domain: QueryDomain,
                          collection: str) -> List[Union[str, TermTuple]]:
-        casts = {'bool': 'boolean', 'int': 'integer', 'float': 'float'}
         normalized_domain: List[Union[str, TermTuple]] = []
         for term in domain:
-            if isinstance(term, (tuple, list)):
+            if isinstance(term, (tuple, list)) and term[1] != '@>':
                 field, operator, value = term
-                cast = casts.get(type(value).__name__,  'text')
-                field = f"(data->>'{field}')::{cast}"
+                field = jsonb_field(collection, field, self.casts.get(
+                    field) or jsonb_cast(value))
                 term = (field, operator, value)
             normalized_domain.append(term)
         return normalized_domain
+
+
+JSONB_CASTS = {'bool': 'boolean', 'int': 'integer', 'float': 'float'}
+
+
+def jsonb_cast(value: Any) -> str:
+    """Cast applied to a jsonb field compared to the given value"""
+    return JSONB_CASTS.get(type(value).__name__, 'text')
+
+
+def jsonb_text(value: Any) -> Any:
+    """Value as the text of a jsonb field, for its text cast comparisons"""
+    return value if isinstance(value, str) else json.dumps(value)
+
+
+def jsonb_field(collection: str, field: str, cast: str = 'text') -> str:
+    """Expression of a jsonb field, as used in the parsed conditions and
+    in the expression indexes meant to serve them."""
+    return f"({collection}->>'{field}')::{cast}"
@@ -0,0 +1,58 @@
+import json
+from typing import List, Union, Any, Callable
+from .types import QueryDomain, TermTuple
+from .sql_parser import SqlParser
+
+
+class SqliteParser(SqlParser):
+    """SqlParser variant for SQLite json columns with '?' placeholders"""
+
+    def __init__(self, evaluator: Callable = lambda x, _: x,
+                 jsonb_collection: str = '',
+                 cache_size: int = 0) -> None:
+        super().__init__(evaluator, 'qmark', jsonb_collection, cache_size)
+
+        self.comparison_dict.update({
+            'in': lambda x, y: '{0} IN (SELECT value FROM json_each({1}))'
+            .format(str(x), str(y)),
+            'like': lambda x, y: '{0} GLOB {1}'.format(str(x), str(y)),
+            'ilike': lambda x, y: '{0} LIKE {1}'.format(str(x), str(y)),
+            'contains': lambda x, y: (
+                'EXISTS (SELECT 1 FROM json_each({0}) WHERE value = {1})'
+                .format(str(x), str(y)))
+        })
+
+        self.binary_dict.update({
+            '|': lambda a, b: '(' + a + ' OR ' + b + ')'})
+
+        self.unary_dict.update({
+            '!': lambda a: 'NOT (' + a + ')'})
+
+    def _parameter(self, operator: str, value: Any, field: str = '') -> Any:
+        if operator == 'in':
+            return json.dumps(value)
+        if operator == 'like' and isinstance(value, str):
+            return glob(value)
+        return value
+
+    def _to_jsonb_domain(self, domain: QueryDomain,
+                         collection: str) -> List[Union[str, TermTuple]]:
+        normalized_domain: List[Union[str, TermTuple]] = []
+        for term in domain:
+            if isinstance(term, (tuple, list)):
+                field, operator, value = term
+                term = (json_field(collection, field), operator, value)
+            normalized_domain.append(term)
+        return normalized_domain
+
+
+def json_field(collection: str, field: str) -> str:
+    """SQLite expression extracting a field of a json column"""
+    return f"json_extract({collection}, '$.{field}')"
+
+
+def glob(pattern: str) -> str:
+    """Case sensitive GLOB pattern equivalent to a LIKE one"""
+    special = {'*': '[*]', '?': '[?]', '[': '[[]', '%': '*', '_': '?'}
+    return ''.join(special.get(character, character)
+                   for character in pattern)
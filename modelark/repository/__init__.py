@@ -1,6 +1,12 @@
 from .repository import *
+from .memory_index import *
 from .memory_repository import *
+from .ordering import *
+from .json_format import *
+from .json_stream import *
 from .json_repository import *
+from .sql_index import *
 from .sql_repository import *
+from .sqlite_repository import *
 from .rest_repository import *
 from .repository_resolver import *
@@ -0,0 +1,61 @@
+import gzip
+import json
+import lzma
+import pickle
+import marshal
+from typing import Any
+
+
+MARSHAL_MAGIC = b'\x00marshal\x00'
+
+
+def encode(data: Any, format: str = 'json') -> bytes:
+    """Serialize a document in one of the supported formats"""
+    if format == 'json':
+        return json.dumps(data, indent=2).encode()
+    if format == 'pickle':
+        return pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+    if format == 'marshal':
+        return MARSHAL_MAGIC + marshal.dumps(data)
+
+    content = json.dumps(data, separators=(',', ':')).encode()
+    if format == 'compact':
+        return content
+    if format == 'gzip':
+        return gzip.compress(content, compresslevel=6)
+    if format == 'lzma':
+        return lzma.compress(content)
+
+    raise ValueError(f"Unsupported format <{format}>.")
+
+
+def decode(content: bytes, format: str = 'json') -> Any:
+    """Deserialize a document written in the given format. Pickle and
+    marshal documents are only loaded when they are the given format."""
+    detected = detect(content)
+    if detected == 'gzip':
+        content = gzip.decompress(content)
+    elif detected == 'lzma':
+        content = lzma.decompress(content)
+    elif detected in ('pickle', 'marshal') and detected != format:
+        raise ValueError(
+            f"Refusing to load a <{detected}> document as <{format}>.")
+    elif detected == 'pickle':
+        return pickle.loads(content)
+    elif detected == 'marshal':
+        return marshal.loads(content[len(MARSHAL_MAGIC):])
+
+    return json.loads(content)
+
+
+def detect(head: bytes) -> str:
+    """Format of a document given its leading bytes"""
+    if head.startswith(b'\x1f\x8b'):
+        return 'gzip'
+    if head.startswith(b'\xfd7zXZ\x00'):
+        return 'lzma'
+    if head.startswith(b'\x80'):
+        return 'pickle'
+    if head.startswith(MARSHAL_MAGIC):
+        return 'marshal'
+    return 'json'
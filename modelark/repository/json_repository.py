@@ -2,17 +2,35 @@ import os
 import time
 import json
 import fcntl
+import asyncio
+import logging
+from copy import copy, deepcopy
+from zlib import crc32
 from uuid import uuid4
 from pathlib import Path
-from collections import defaultdict
-from contextlib import contextmanager
-from typing import Dict, List, Tuple, Any, Callable, Generic, Union, cast
+from threading import Lock
+from functools import partial
+from itertools import islice
+from weakref import WeakValueDictionary
+from collections import defaultdict, OrderedDict
+from contextlib import contextmanager, asynccontextmanager
+from typing import (
+    Dict, List, Tuple, Any, Callable, Generic, Union, Optional, IO,
+    AsyncIterator, Iterator, Generator, MutableMapping, cast)
 from ..common import (
     T, R, L, Locator, DefaultLocator, Editor, DefaultEditor)
-from ..filterer import Filterer, FunctionParser, Domain
+from ..filterer import Filterer, FunctionParser, Domain, conjuncts
+from .json_format import encode, decode, detect
+from .json_stream import stream_records
+from .ordering import arrange
 from .repository import Repository
 
 
+logger = logging.getLogger(__name__)
+
+IndexTerm = Tuple[str, str, List[str]]
+
+
 class JsonRepository(Repository, Generic[T]):
     def __init__(self,
                  data_path: str,
@@ -20,121 +38,628 @@ class JsonRepository(Repository, Generic[T]):
                  constructor: Callable[..., T],
                  filterer: Filterer = None,
                  locator: Locator = None,
-                 editor: Editor = None) -> None:
+                 editor: Editor = None,
+                 cache_size: int = 0,
+                 storage: str = 'document',
+                 fsync: str = 'batch',
+                 compaction_ratio: float = 1.0,
+                 compaction_size: int = 1 << 20,
+                 shards: int = 0,
+                 indexes: List[str] = None,
+                 format: str = 'json') -> None:
         self.data_path = data_path
         self.collection = collection
         self.constructor: Callable[..., T] = constructor
         self.filterer = filterer or FunctionParser()
         self.locator = locator or DefaultLocator()
         self.editor = editor or DefaultEditor()
+        self.cache_size = cache_size
+        self.cache: 'OrderedDict[str, Tuple[Tuple, Dict[str, Any]]]' = (
+            OrderedDict())
+        self.storage = storage
+        self.fsync = fsync
+        self.compaction_ratio = compaction_ratio
+        self.compaction_size = compaction_size
+        self.shards = shards
+        self.indexes: List[str] = indexes or []
+        self.format = format
+        self._shard: Optional[int] = None
+        self._compactions: Dict[str, asyncio.Future] = {}
+        self._cache_lock = Lock()
+        self._pending: Dict[str, List[Tuple[str, List[T], Any]]] = {}
 
     async def setup(self) -> None:
-        if not self.file_path.exists():
-            self.file_path.parent.mkdir(parents=True, exist_ok=True)
-            with locked_open(str(self.file_path), 'w') as f:
-                f.write("{}")
+        if self.shards:
+            await asyncio.gather(*[
+                shard.setup() for shard in self._shard_views])
+            return
+        await self._run(self._setup)
 
     async def add(self, item: Union[T, List[T]]) -> List[T]:
-        await self.setup()
+        items = item if isinstance(item, list) else [item]
 
+        for item in items:
+            item.updated_at = int(time.time())
+            item.updated_by = self.editor.reference
+            item.created_at = item.created_at or item.updated_at
+            item.created_by = item.created_by or item.updated_by
+
+        if self.shards:
+            await asyncio.gather(*[shard._submit('add', group) for
+                                   shard, group in self._route(items)])
+            return items
+
+        return await self._submit('add', items)
+
+    async def remove(self, item: Union[T, List[T]]) -> bool:
         items = item if isinstance(item, list) else [item]
+        if self.shards:
+            return any(await asyncio.gather(*[
+                shard._submit('remove', group) for
+                shard, group in self._route(items)]))
 
-        data: Dict[str, Any] = defaultdict(lambda: {})
-        with locked_open(str(self.file_path), 'r+') as f:
-            data.update(json.loads(f.read()))
+        return await self._submit('remove', items)
 
-            for item in items:
-                item.updated_at = int(time.time())
-                item.updated_by = self.editor.reference
-                item.created_at = item.created_at or item.updated_at
-                item.created_by = item.created_by or item.updated_by
+    async def count(self, domain: Domain = None) -> int:
+        if self.shards:
+            return sum(await asyncio.gather(*[
+                shard.count(domain) for shard in self._shard_views]))
+
+        async with self._guard(shared=True):
+            return await self._run(self._count, domain)
 
-                data[self.collection][item.id] = vars(item)
+    async def search(self, domain: Domain,
+                     limit: int = None, offset: int = None,
+                     order: str = None) -> List[T]:
+        if self.shards:
+            stop = None if limit is None else (offset or 0) + limit
+            results = await asyncio.gather(*[
+                shard.search(domain, stop, None, order)
+                for shard in self._shard_views])
+            items = [item for result in results for item in result]
+            return cast(List[T], arrange(items, order, limit, offset))
 
-            f.seek(f.truncate(0))
-            f.write(json.dumps(data, indent=2))
+        async with self._guard(shared=True):
+            return await self._run(
+                self._search, domain, limit, offset, order)
 
-        return items
+    async def stream(self, domain: Domain,
+                     batch_size: int = 100) -> AsyncIterator[T]:
+        """Matching items, read one record at a time. Close streams left
+        early with aclose() to release the file."""
+        for repository in self._shard_views if self.shards else [self]:
+            matches = repository._matches(domain)
+            try:
+                while True:
+                    batch = await self._run(
+                        lambda: list(islice(matches, batch_size)))
+                    for item in batch:
+                        yield item
+                    if len(batch) < batch_size:
+                        break
+            finally:
+                matches.close()
 
-    async def remove(self, item: Union[T, List[T]]) -> bool:
+    async def compact(self) -> None:
+        """Fold the log entries into the snapshot and empty the log"""
+        if self.storage != 'log':
+            return
+        if self.shards:
+            await asyncio.gather(*[
+                shard.compact() for shard in self._shard_views])
+            return
+        async with self._guard():
+            await self._run(self._compact)
+
+    def _setup(self) -> None:
         if not self.file_path.exists():
-            return False
+            self.file_path.parent.mkdir(parents=True, exist_ok=True)
+            with locked_open(str(self.lock_path), 'a'):
+                if not self.file_path.exists():
+                    self._write({})
+        if self.storage == 'log' and not self.log_path.exists():
+            self.log_path.touch()
 
-        items = item if isinstance(item, list) else [item]
+    def _commit(self, operations: List[Tuple[str, List[T]]]
+                ) -> Tuple[List[Any], bool]:
+        """Apply a batch of add and remove operations in a single
+        read-modify-write cycle, returning each operation result and
+        whether the log is due for compaction."""
+        if not self.file_path.exists() and all(
+                kind == 'remove' for kind, _ in operations):
+            return [False] * len(operations), False
+
+        self._setup()
+
+        if self.storage == 'log':
+            with locked_open(str(self.log_path), 'ab+') as f:
+                records: Dict[str, Any] = {}
+                if any(kind == 'remove' for kind, _ in operations):
+                    records = self._replay(f).get(self.collection, {})
+                results, entries = self._stage(
+                    operations, dict.fromkeys(records, True))
+                self._append(f, entries)
+                return results, self._compaction_due(f.tell())
 
-        with locked_open(str(self.file_path), 'r+') as f:
-            data = json.loads(f.read())
+        with locked_open(str(self.lock_path), 'a'):
+            data = dict(self._load())
+            records = dict(data.get(self.collection, {}))
+
+            results, entries = self._stage(operations, records)
+            for entry in entries:
+                if 'put' in entry:
+                    records[entry['put']['id']] = entry['put']
+                else:
+                    del records[entry['remove']]
+
+            data[self.collection] = records
+            self._write(data)
+
+        return results, False
+
+    def _stage(self, operations: List[Tuple[str, List[T]]],
+               records: Dict[str, Any]) -> Tuple[List[Any], List[Dict]]:
+        """Log entries and results of the operations, tracking which
+        ids exist as the operations are applied in order."""
+        present = {id: bool(record) for id, record in records.items()}
+        results: List[Any] = []
+        entries: List[Dict[str, Any]] = []
+        for kind, items in operations:
+            if kind == 'add':
+                for item in items:
+                    present[item.id] = True
+                    entries.append({'put': deepcopy(vars(item))})
+                results.append(items)
+                continue
 
             deleted = False
             for item in items:
-                deleted_item = data[self.collection].pop(item.id, None)
-                deleted = bool(deleted_item) or deleted
-
-            f.seek(f.truncate(0))
-            f.write(json.dumps(data, indent=2))
+                if item.id in present:
+                    deleted = present.pop(item.id) or deleted
+                    entries.append({'remove': item.id})
+            results.append(deleted)
 
-        return deleted
+        return results, entries
 
-    async def count(self, domain: Domain = None) -> int:
+    def _count(self, domain: Domain = None) -> int:
         if not self.file_path.exists():
             return 0
 
-        with locked_open(str(self.file_path), 'r') as f:
-            data = json.loads(f.read())
+        count = 0
+        domain = domain or []
+        filter_function = self.filterer.parse(domain)
+        for item_dict in self._records(domain):
+            item = self.constructor(**item_dict)
+            if filter_function(item):
+                count += 1
 
-            count = 0
-            domain = domain or []
-            filter_function = self.filterer.parse(domain)
-            for item_dict in list(data[self.collection].values()):
-                item = self.constructor(**item_dict)
-                if filter_function(item):
-                    count += 1
+        return count
 
-            return count
-
-    async def search(self, domain: Domain,
-                     limit: int = None, offset: int = None,
-                     order: str = None) -> List[T]:
+    def _search(self, domain: Domain, limit: int = None,
+                offset: int = None, order: str = None) -> List[T]:
         items: List[T] = []
         if not self.file_path.exists():
             return items
 
-        with locked_open(str(self.file_path), 'r') as f:
-            data = json.loads(f.read())
-            items_dict = data.get(self.collection, {})
+        filter_function = self.filterer.parse(domain)
+        for item_dict in self._records(domain):
+            item = self.constructor(**item_dict)
 
-            filter_function = self.filterer.parse(domain)
-            for item_dict in items_dict.values():
-                item = self.constructor(**item_dict)
+            if filter_function(item):
+                items.append(self._detach(item, item_dict))
 
-                if filter_function(item):
-                    items.append(item)
+        return cast(List[T], arrange(items, order, limit, offset))
 
-            if offset is not None:
-                items = items[offset:]
-            if limit is not None:
-                items = items[:limit]
-            if not order:
-                return items
+    def _matches(self, domain: Domain) -> Generator[T, None, None]:
+        if not self.file_path.exists():
+            return
 
-            fields = order.lower().split(',')
-            for field in reversed(fields):
-                key, *direction = field.split()
-                items = cast(List[T], sorted(
-                    items, key=lambda item: getattr(item, key),
-                    reverse=('desc' in direction)))
+        filter_function = self.filterer.parse(domain)
+        if self.storage == 'log':
+            records = iter(list(
+                self._load().get(self.collection, {}).values()))
+        else:
+            records = self._stream_records()
 
-            return items
+        for record in records:
+            item = self.constructor(**record)
+            if filter_function(item):
+                yield self._detach(item, record)
+
+    def _detach(self, item: Any, record: Dict[str, Any]) -> T:
+        """Item built again from a copy of its record when records are
+        cached, so that changes to the item never reach the cache."""
+        if not self.cache_size:
+            return item
+        return self.constructor(**deepcopy(record))
+
+    def _stream_records(self) -> Iterator[Dict[str, Any]]:
+        with locked_open(str(self.file_path), 'rb') as f:
+            if detect(f.read(16)) != 'json':
+                f.seek(0)
+                yield from list(decode(f.read(), self.format).get(
+                    self.collection, {}).values())
+                return
+            for _, record in stream_records(f, self.collection):
+                yield record
+
+    def _records(self, domain: Domain) -> List[Dict[str, Any]]:
+        """Stored records that might match the domain"""
+        terms = self._indexed_terms(domain)
+        if terms:
+            with locked_open(str(self.file_path), 'rb') as f:
+                identity = _identity(os.fstat(f.fileno()))
+                index = self._read_index()
+                if index and tuple(index['identity']) == identity:
+                    records = self._fetch(f, index, terms)
+                    if records is not None:
+                        return records
+
+        return list(self._load().get(self.collection, {}).values())
+
+    def _indexed_terms(self, domain: Domain) -> List[IndexTerm]:
+        """Index usable conjuncts, as (field, operator, values) terms"""
+        if not self.indexes or self.storage != 'document':
+            return []
+
+        terms: List[IndexTerm] = []
+        evaluator = getattr(self.filterer, 'evaluator', lambda x, _: x)
+        for field, operator, value in conjuncts(domain):
+            if field not in ('id', *self.indexes):
+                continue
+            value = evaluator(value, None)
+            values = [value] if operator == '=' else value
+            if operator not in ('=', 'in') or not isinstance(values, list):
+                continue
+            if all(isinstance(value, str) for value in values):
+                terms.append((field, operator, values))
+
+        return terms
+
+    def _fetch(self, file: IO, index: Dict[str, Any],
+               terms: List[IndexTerm]) -> Optional[List[Dict[str, Any]]]:
+        offsets = index['offsets']
+        ids: Optional[Dict[str, None]] = None
+        for field, _, values in terms:
+            if field == 'id':
+                matches = dict.fromkeys(
+                    value for value in values if value in offsets)
+            elif field in index['fields']:
+                entries = index['fields'][field]
+                matches = dict.fromkeys(entries['missing'])
+                for value in values:
+                    matches.update(dict.fromkeys(
+                        entries['values'].get(value, [])))
+            else:
+                continue
+            ids = matches if ids is None else {
+                id: None for id in ids if id in matches}
+
+        if ids is None:
+            return None
+
+        records = []
+        for id in sorted(ids, key=lambda id: offsets[id][0]):
+            start, end = offsets[id]
+            file.seek(start)
+            records.append(json.loads(file.read(end - start)))
+        return records
+
+    def _read_index(self) -> Optional[Dict[str, Any]]:
+        path = str(self.index_path)
+        try:
+            with open(path) as f:
+                identity = _identity(os.fstat(f.fileno()))
+                entry = self._cached(path)
+                if entry and entry[0] == identity:
+                    return entry[1]
+                index = json.loads(f.read())
+        except (FileNotFoundError, ValueError):
+            return None
+
+        self._remember(path, identity, index)
+        return index
+
+    def _serialize(self, data: Dict[str, Any]) -> Tuple[
+            bytes, Optional[Dict[str, List[int]]]]:
+        """Encoded document and its record offsets, if they are indexed"""
+        if (not self.indexes or self.storage != 'document' or
+                self.format not in ('json', 'compact') or
+                set(data) - {self.collection}):
+            return encode(data, self.format), None
+
+        chunks = ['{' + json.dumps(self.collection) + ': {\n']
+        offsets: Dict[str, List[int]] = {}
+        position = len(chunks[0])
+        for id, record in data.get(self.collection, {}).items():
+            prefix = f'{"," if offsets else ""}\n{json.dumps(id)}: '
+            body = json.dumps(record)
+            start = position + len(prefix)
+            position = start + len(body)
+            offsets[id] = [start, position]
+            chunks.extend((prefix, body))
+        chunks.append('\n}}')
+
+        return ''.join(chunks).encode(), offsets
+
+    def _write_index(self, data: Dict[str, Any], identity: Tuple,
+                     offsets: Dict[str, List[int]]) -> None:
+        """Replace the index file of a just written collection file"""
+        records = data.get(self.collection, {})
+        fields: Dict[str, Any] = {}
+        for field in self.indexes:
+            values: Dict[str, List[str]] = defaultdict(list)
+            missing = []
+            for id, record in records.items():
+                if field not in record:
+                    missing.append(id)
+                elif isinstance(record[field], str):
+                    values[record[field]].append(id)
+            fields[field] = {'values': values, 'missing': missing}
+
+        index = {'identity': identity, 'offsets': offsets, 'fields': fields}
+        path = str(self.index_path)
+        temporary = f'{path}.{uuid4().hex}.tmp'
+        with open(temporary, 'w') as f:
+            f.write(json.dumps(index))
+        os.replace(temporary, path)
+
+    async def _submit(self, kind: str, items: List[T]) -> Any:
+        """Queue a write operation for the collection file, to be
+        committed together with the others queued meanwhile."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        path = str(self.file_path)
+        batch = self._pending.setdefault(path, [])
+        batch.append((kind, items, future))
+        if len(batch) == 1:
+            loop.create_task(self._flush(path))
+        return await future
+
+    async def _flush(self, path: str) -> None:
+        """Commit every write queued for the path once it's its turn"""
+        async with self._guard():
+            batch = self._pending.pop(path)
+            try:
+                results, compaction_due = await self._run(
+                    self._commit, [(kind, items) for kind, items, _ in batch])
+            except Exception as error:
+                for *_, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                return
+
+        for result, (*_, future) in zip(results, batch):
+            if not future.done():
+                future.set_result(result)
+        if compaction_due:
+            self._schedule_compaction()
+
+    async def _run(self, function: Callable, *args: Any) -> Any:
+        """Run a blocking function in the loop's default executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, partial(function, *args))
+
+    @asynccontextmanager
+    async def _guard(self, shared: bool = False) -> AsyncIterator[None]:
+        """Queue the coroutines of this process touching the same file"""
+        if shared and self.storage != 'log':
+            yield
+            return
+
+        path = str(self.file_path)
+        lock = _file_locks.get(path)
+        if lock is None:
+            lock = _file_locks[path] = asyncio.Lock()
+        async with lock:
+            yield
+
+    def _load(self) -> Dict[str, Any]:
+        if self.storage == 'log':
+            if not self.log_path.exists():
+                self.log_path.touch()
+            with locked_open(str(self.log_path), 'rb') as f:
+                return self._replay(f)
+
+        path = str(self.file_path)
+        entry = self._cached(path)
+        if entry and entry[0] == _identity(os.stat(path)):
+            return entry[1]
+
+        with locked_open(path, 'rb') as f:
+            return self._read(f)
+
+    def _read(self, file: IO) -> Dict[str, Any]:
+        """Decoded document of an open file, cached by its identity"""
+        identity = _identity(os.fstat(file.fileno()))
+        entry = self._cached(file.name)
+        if entry and entry[0] == identity:
+            return entry[1]
+
+        data = decode(file.read(), self.format)
+        self._remember(file.name, identity, data)
+        return data
+
+    def _write(self, data: Dict[str, Any], remember: bool = True) -> None:
+        """Atomically replace the collection file with a new document"""
+        path = str(self.file_path)
+        temporary = f'{path}.{uuid4().hex}.tmp'
+        content, offsets = self._serialize(data)
+        with open(temporary, 'wb') as f:
+            f.write(content)
+            f.flush()
+            if self.fsync == 'write' or (
+                    self.storage == 'log' and self.fsync != 'none'):
+                os.fsync(f.fileno())
+            identity = _identity(os.fstat(f.fileno()))
+        os.replace(temporary, path)
+        if offsets is not None:
+            self._write_index(data, identity, offsets)
+        if remember:
+            self._remember(path, identity, data)
+
+    def _cached(self, path: str) -> Optional[Tuple[Tuple, Dict[str, Any]]]:
+        with self._cache_lock:
+            entry = self.cache.get(path)
+            if entry:
+                self.cache.move_to_end(path)
+            return entry
+
+    def _remember(self, path: str, identity: Tuple,
+                  data: Dict[str, Any]) -> None:
+        if not self.cache_size:
+            return
+        with self._cache_lock:
+            self.cache[path] = (identity, data)
+            self.cache.move_to_end(path)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def _replay(self, log: IO) -> Dict[str, Any]:
+        """Snapshot document with the log entries applied"""
+        snapshot = _identity(os.stat(str(self.file_path)))
+        stat = os.fstat(log.fileno())
+        entry = self._cached(log.name)
+        if entry and entry[0][:3] == (snapshot, stat.st_dev, stat.st_ino
+                                      ) and entry[0][3] <= stat.st_size:
+            offset, data = entry[0][3], entry[1]
+        else:
+            offset, data = 0, self._read_snapshot()
+
+        log.seek(offset)
+        offset = self._apply(data, log, offset)
+        self._remember(log.name, (
+            snapshot, stat.st_dev, stat.st_ino, offset), data)
+        return data
+
+    def _read_snapshot(self) -> Dict[str, Any]:
+        with open(str(self.file_path), 'rb') as f:
+            return decode(f.read(), self.format)
+
+    def _apply(self, data: Dict[str, Any], log: IO, offset: int) -> int:
+        records = data.setdefault(self.collection, {})
+        for line in log:
+            if not line.endswith(b'\n'):
+                break
+            offset += len(line)
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if 'put' in entry:
+                records[entry['put']['id']] = entry['put']
+            else:
+                records.pop(entry['remove'], None)
+        return offset
+
+    def _append(self, log: IO, entries: List[Dict[str, Any]]) -> None:
+        """Append entries to the locked log, honoring the fsync policy
+        ('write' per entry, 'batch' per call or 'none')."""
+        start = log.seek(0, os.SEEK_END)
+        if start:
+            log.seek(start - 1)
+            if log.read(1) != b'\n':
+                log.write(b'\n')
+        for entry in entries:
+            log.write(json.dumps(entry).encode() + b'\n')
+            if self.fsync == 'write':
+                log.flush()
+                os.fsync(log.fileno())
+        log.flush()
+        if self.fsync == 'batch':
+            os.fsync(log.fileno())
+
+        stat = os.fstat(log.fileno())
+        cached = self._cached(log.name)
+        if cached and cached[0][1:] == (stat.st_dev, stat.st_ino, start):
+            log.seek(start)
+            self._replay(log)
+
+    def _compaction_due(self, log_size: int) -> bool:
+        """Whether the log outgrew the compaction size and ratio"""
+        if log_size < self.compaction_size:
+            return False
+        snapshot_size = os.stat(str(self.file_path)).st_size
+        return log_size >= self.compaction_ratio * snapshot_size
+
+    def _schedule_compaction(self) -> None:
+        path = str(self.log_path)
+        compaction = self._compactions.get(path)
+        if compaction and not compaction.done():
+            return
+        compaction = asyncio.ensure_future(self.compact())
+        compaction.add_done_callback(_report_compaction)
+        self._compactions[path] = compaction
+
+    def _route(self, items: List[T]) -> List[Tuple['JsonRepository', List]]:
+        """Items grouped by the shard their id hashes to"""
+        groups: Dict[int, List[T]] = defaultdict(list)
+        for item in items:
+            groups[crc32(item.id.encode()) % self.shards].append(item)
+        return [(self._shard_view(index), group)
+                for index, group in groups.items()]
+
+    def _shard_view(self, index: int) -> 'JsonRepository':
+        """Repository of a single shard file, sharing the cache"""
+        shard = copy(self)
+        shard.shards, shard._shard = 0, index
+        return shard
+
+    @property
+    def _shard_views(self) -> List['JsonRepository']:
+        return [self._shard_view(index) for index in range(self.shards)]
+
+    def _compact(self) -> None:
+        if not self.file_path.exists():
+            return
+        self._setup()
+        with locked_open(str(self.log_path), 'rb+') as log:
+            data = self._read_snapshot()
+            self._apply(data, log, 0)
+            self._write(data, remember=False)
+
+            log.truncate(0)
+            if self.fsync != 'none':
+                os.fsync(log.fileno())
 
     @property
     def file_path(self) -> Path:
+        name = self.collection
+        if self._shard is not None:
+            name = f"{name}.{self._shard}"
         return (Path(self.data_path) / self.locator.zone /
-                self.locator.location / f"{self.collection}.json")
+                self.locator.location / f"{name}.json")
+
+    @property
+    def log_path(self) -> Path:
+        return self.file_path.with_suffix('.log')
+
+    @property
+    def lock_path(self) -> Path:
+        return self.file_path.with_suffix('.lock')
+
+    @property
+    def index_path(self) -> Path:
+        return self.file_path.with_suffix('.index')
+
+
+_file_locks: MutableMapping[str, asyncio.Lock] = WeakValueDictionary()
+
+
+def _identity(stat: os.stat_result) -> Tuple:
+    return (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+def _report_compaction(compaction: asyncio.Future) -> None:
+    if not compaction.cancelled() and compaction.exception():
+        logger.error('Background log compaction failed.',
+                     exc_info=compaction.exception())
 
 
 @contextmanager
 def locked_open(filename, mode='r'):
+    shared = set(mode) <= set('rbt')
     with open(filename, mode) as file:
-        fcntl.flock(file, fcntl.LOCK_EX)
+        fcntl.flock(file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
         yield file
         fcntl.flock(file, fcntl.LOCK_UN)
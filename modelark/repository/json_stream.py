@@ -0,0 +1,112 @@
+import os
+import re
+import json
+import mmap
+import codecs
+from typing import Any, IO, Iterator, Match, Tuple, cast
+
+
+def stream_records(file: IO, collection: str,
+                   chunk_size: int = 1 << 20) -> Iterator[Tuple[str, Any]]:
+    """(id, record) pairs of a {collection: {id: record}} document, read
+    from a memory map a chunk at a time."""
+    if not os.fstat(file.fileno()).st_size:
+        return
+
+    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+        tokenizer = Tokenizer(view, chunk_size)
+        tokenizer.expect('{')
+        if tokenizer.close('}'):
+            return
+
+        while True:
+            key = tokenizer.string()
+            tokenizer.expect(':')
+            if key != collection:
+                tokenizer.value()
+            else:
+                tokenizer.expect('{')
+                closed = tokenizer.close('}')
+                while not closed:
+                    id = tokenizer.string()
+                    tokenizer.expect(':')
+                    yield id, tokenizer.value()
+                    closed = tokenizer.separator('}')
+
+            if tokenizer.separator('}'):
+                return
+
+
+class Tokenizer:
+    """Incremental JSON tokenizer over a bytes buffer"""
+
+    whitespace = re.compile(r'[ \t\n\r]*')
+
+    def __init__(self, buffer: Any, chunk_size: int = 1 << 20) -> None:
+        self.buffer = buffer
+        self.chunk_size = chunk_size
+        self.offset = 0
+        self.text = ''
+        self.position = 0
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.json = json.JSONDecoder()
+
+    def expect(self, token: str) -> None:
+        if self.peek() != token:
+            raise self.error(f'Expecting {token!r}')
+        self.position += 1
+
+    def close(self, token: str) -> bool:
+        if self.peek() != token:
+            return False
+        self.position += 1
+        return True
+
+    def separator(self, closing: str) -> bool:
+        """Consume a ',' or the closing token, telling if it closed"""
+        if self.close(','):
+            return False
+        self.expect(closing)
+        return True
+
+    def string(self) -> str:
+        if self.peek() != '"':
+            raise self.error('Expecting property name')
+        return self.value()
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self.json.raw_decode(self.text, self.position)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            if end < len(self.text) or not self.fill():
+                self.position = end
+                return value
+
+    def peek(self) -> str:
+        """Next non whitespace character, without consuming it"""
+        while True:
+            self.position = cast(Match[str], self.whitespace.match(
+                self.text, self.position)).end()
+            if self.position < len(self.text):
+                return self.text[self.position]
+            if not self.fill():
+                raise self.error('Unexpected end of document')
+
+    def fill(self) -> bool:
+        """Append the next chunk to the pending text"""
+        if self.offset >= len(self.buffer):
+            return False
+        chunk = self.buffer[self.offset:self.offset + self.chunk_size]
+        self.offset += len(chunk)
+        self.text = self.text[self.position:] + self.decoder.decode(
+            chunk, final=self.offset >= len(self.buffer))
+        self.position = 0
+        return True
+
+    def error(self, message: str) -> json.JSONDecodeError:
+        return json.JSONDecodeError(message, self.text, self.position)
@@ -0,0 +1,119 @@
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+
+class HashIndex:
+    """Field value to entity ids mapping for '=' and 'in' lookups"""
+
+    def __init__(self, field: str) -> None:
+        self.field = field
+        self.buckets: Dict[Any, Dict[str, None]] = {}
+        self.keys: Dict[str, Any] = {}
+        self.unhashable: Dict[str, None] = {}
+
+    def add(self, id: str, item: Any) -> None:
+        self.remove(id)
+        if not hasattr(item, self.field):
+            return
+
+        value = getattr(item, self.field)
+        try:
+            self.buckets.setdefault(value, {})[id] = None
+        except TypeError:
+            self.unhashable[id] = None
+        else:
+            self.keys[id] = value
+
+    def remove(self, id: str) -> None:
+        self.unhashable.pop(id, None)
+        if id not in self.keys:
+            return
+
+        value = self.keys.pop(id)
+        bucket = self.buckets[value]
+        del bucket[id]
+        if not bucket:
+            del self.buckets[value]
+
+    def lookup(self, values: Iterable[Any]) -> Dict[str, None]:
+        """Ids of the items whose field might equal any of the values"""
+        result = dict(self.unhashable)
+        for value in values:
+            result.update(self.buckets.get(value, {}))
+        return result
+
+
+class OrderedIndex:
+    """Sorted field values with their entity ids for range lookups"""
+
+    def __init__(self, field: str) -> None:
+        self.field = field
+        self.values: List[Any] = []
+        self.ids: List[str] = []
+        self.keys: Dict[str, Any] = {}
+        self.unordered: Dict[str, None] = {}
+
+    def add(self, id: str, item: Any) -> None:
+        self.remove(id)
+        if not hasattr(item, self.field):
+            return
+
+        value = getattr(item, self.field)
+        try:
+            position = bisect_right(self.values, value)
+        except TypeError:
+            self.unordered[id] = None
+            return
+
+        self.values.insert(position, value)
+        self.ids.insert(position, id)
+        self.keys[id] = value
+
+    def remove(self, id: str) -> None:
+        self.unordered.pop(id, None)
+        if id not in self.keys:
+            return
+
+        value = self.keys.pop(id)
+        lower = bisect_left(self.values, value)
+        upper = bisect_right(self.values, value)
+        position = self.ids.index(id, lower, upper)
+        del self.values[position]
+        del self.ids[position]
+
+    def span(self, bounds: List[Tuple[str, Any]]) -> Tuple[int, int]:
+        """Positions range satisfying all the (operator, value) bounds"""
+        lower, upper = 0, len(self.values)
+        for operator, value in bounds:
+            if operator in ('>=', '='):
+                lower = max(lower, bisect_left(self.values, value))
+            elif operator == '>':
+                lower = max(lower, bisect_right(self.values, value))
+            if operator in ('<=', '='):
+                upper = min(upper, bisect_right(self.values, value))
+            elif operator == '<':
+                upper = min(upper, bisect_left(self.values, value))
+        return lower, max(lower, upper)
+
+    def lookup(self, bounds: List[Tuple[str, Any]]) -> Dict[str, None]:
+        """Ids of the items whose field might satisfy all the bounds"""
+        lower, upper = self.span(bounds)
+        result = dict(self.unordered)
+        result.update(dict.fromkeys(self.ids[lower:upper]))
+        return result
+
+    def scan(self, lower: int, upper: int,
+             descending: bool = False) -> Iterator[List[str]]:
+        """Groups of ids sharing the same value, in index order"""
+        values = self.values
+        if not descending:
+            while lower < upper:
+                end = bisect_right(values, values[lower], lower, upper)
+                yield self.ids[lower:end]
+                lower = end
+            return
+
+        while upper > lower:
+            start = bisect_left(values, values[upper - 1], lower, upper)
+            yield self.ids[start:upper]
+            upper = start
@@ -1,22 +1,41 @@
 import time
 from uuid import uuid4
+from itertools import count
 from collections import defaultdict
-from typing import List, Tuple, Dict, Generic, Union, Any, cast
+from typing import (
+    List, Tuple, Dict, Generic, Union, Any, Optional, Iterable, Iterator,
+    Callable, cast)
 from ..common import (
     T, R, L, Locator, DefaultLocator, Editor, DefaultEditor)
-from ..filterer import Filterer, FunctionParser, Domain
+from ..filterer import Filterer, FunctionParser, Domain, Term, conjuncts
+from .memory_index import HashIndex, OrderedIndex
+from .ordering import arrange, parse_order, sort_items
 from .repository import Repository
 
 
 class MemoryRepository(Repository, Generic[T]):
+
+    _range_operators = ('=', '<', '<=', '>', '>=')
+
     def __init__(self, filterer: Filterer = None,
                  locator: Locator = None,
-                 editor: Editor = None) -> None:
+                 editor: Editor = None,
+                 indexes: List[str] = None,
+                 ordered_indexes: List[str] = None) -> None:
         self.filterer: Filterer = filterer or FunctionParser()
         self.locator: Locator = locator or DefaultLocator()
         self.editor: Editor = editor or DefaultEditor()
         self.data: Dict[str, Dict[str, T]] = defaultdict(dict)
         self.max_items = 10_000
+        self.index_fields: List[str] = indexes or []
+        self.ordered_index_fields: List[str] = ordered_indexes or []
+        self.indexes: Dict[str, Dict[str, HashIndex]] = defaultdict(
+            lambda: {field: HashIndex(field) for field in self.index_fields})
+        self.ordered_indexes: Dict[str, Dict[str, OrderedIndex]] = (
+            defaultdict(lambda: {field: OrderedIndex(field)
+                                 for field in self.ordered_index_fields}))
+        self.positions: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self._sequence = count()
 
     async def add(self, item: Union[T, List[T]]) -> List[T]:
         items = item if isinstance(item, list) else [item]
@@ -26,7 +45,13 @@ class MemoryRepository(Repository, Generic[T]):
             item.updated_by = self.editor.reference
             item.created_at = item.created_at or item.updated_at
             item.created_by = item.created_by or item.updated_by
-            self.data[self._location][item.id] = item
+            records = self.data[self._location]
+            if item.id not in records and self._indexes:
+                self.positions[self._location][item.id] = next(
+                    self._sequence)
+            records[item.id] = item
+            for index in self._indexes:
+                index.add(item.id, item)
 
         return items
 
@@ -37,6 +62,9 @@ class MemoryRepository(Repository, Generic[T]):
             if item.id not in self.data[self._location]:
                 continue
             del self.data[self._location][item.id]
+            self.positions[self._location].pop(item.id, None)
+            for index in self._indexes:
+                index.remove(item.id)
             deleted = True
 
         return deleted
@@ -45,7 +73,7 @@ class MemoryRepository(Repository, Generic[T]):
         count = 0
         domain = domain or []
         filter_function = self.filterer.parse(domain)
-        for item in list(self.data[self._location].values()):
+        for item in self._candidates(domain):
             if filter_function(item):
                 count += 1
         return count
@@ -55,30 +83,150 @@ class MemoryRepository(Repository, Generic[T]):
                      order: str = None) -> List[T]:
         items: List[T] = []
         filter_function = self.filterer.parse(domain)
-        for item in list(self.data.setdefault(self._location, {}).values()):
+        groups = self._scan(domain, order)
+        if groups is not None:
+            return self._search_groups(
+                groups, filter_function, limit, offset, order)
+
+        for item in self._candidates(domain):
             if filter_function(item):
                 items.append(item)
 
-        if offset is not None:
-            items = items[offset:]
-
         if limit is not None:
-            items = items[:min(limit, self.max_items)]
+            limit = min(limit, self.max_items)
 
-        if order:
-            fields = order.lower().split(',')
-            for field in reversed(fields):
-                key, *direction = field.split()
-                items = cast(List[T], sorted(
-                    items, key=lambda item: getattr(item, key),
-                    reverse=('desc' in direction)))
-
-        return items
+        return cast(List[T], arrange(items, order, limit, offset))
 
     def load(self, data: Dict[str, Dict[str, T]]):
         self.data.update(data)
+        for location, records in data.items():
+            self.indexes.pop(location, None)
+            self.ordered_indexes.pop(location, None)
+            self.positions.pop(location, None)
+            if not (self.index_fields or self.ordered_index_fields):
+                continue
+            self.positions[location] = {
+                id: next(self._sequence) for id in records}
+            indexes: List[Union[HashIndex, OrderedIndex]] = [
+                *self.indexes[location].values(),
+                *self.ordered_indexes[location].values()]
+            for id, item in records.items():
+                for index in indexes:
+                    index.add(id, item)
         return self
 
+    def _search_groups(self, groups: Iterator[List[T]],
+                       filter_function: Callable, limit: int = None,
+                       offset: int = None, order: str = None) -> List[T]:
+        items: List[T] = []
+        fields = parse_order(order or '')[1:]
+        start = offset or 0
+        stop = None if limit is None else (
+            start + min(limit, self.max_items))
+        for group in groups:
+            matches = [item for item in group if filter_function(item)]
+            if fields and len(matches) > 1:
+                matches = sort_items(matches, fields)
+            items.extend(matches)
+            if stop is not None and len(items) >= stop:
+                break
+
+        return items[start:stop]
+
+    def _candidates(self, domain: Domain) -> List[T]:
+        records = self.data.setdefault(self._location, {})
+        ids = self._lookup(self._conjuncts(domain))
+        if ids is None:
+            return list(records.values())
+        return [records[id] for id in self._stored(ids, records)]
+
+    def _scan(self, domain: Domain,
+              order: str = None) -> Optional[Iterator[List[T]]]:
+        """Candidate groups following the ordered index of the first
+        order field, or None if the index can't serve the query."""
+        if not order or not self.ordered_index_fields:
+            return None
+
+        key, descending = parse_order(order)[0]
+        index = self.ordered_indexes[self._location].get(key)
+        if index is None or index.unordered:
+            return None
+
+        terms = self._conjuncts(domain)
+        bounds = [(operator, value) for field, operator, value in terms
+                  if field == key and operator in self._range_operators]
+        try:
+            lower, upper = index.span(bounds)
+        except TypeError:
+            return None
+
+        ids = self._lookup(terms, skip=key)
+        if ids is not None and len(ids) < upper - lower:
+            return None
+
+        records = self.data[self._location]
+        return ([records[id] for id in self._stored(
+            [id for id in group if ids is None or id in ids], records)]
+            for group in index.scan(lower, upper, descending))
+
+    def _stored(self, ids: Iterable[str],
+                records: Dict[str, T]) -> List[str]:
+        """The ids present in the records, in the records order, so that
+        indexes never change the order of the results."""
+        positions = self.positions[self._location]
+        try:
+            return sorted((id for id in ids if id in records),
+                          key=positions.__getitem__)
+        except KeyError:
+            ids = set(ids)
+            return [id for id in records if id in ids]
+
+    def _conjuncts(self, domain: Domain) -> List[Term]:
+        if not (self.index_fields or self.ordered_index_fields):
+            return []
+        evaluator = getattr(self.filterer, 'evaluator', lambda x, _: x)
+        return [(field, operator, evaluator(value, None))
+                for field, operator, value in conjuncts(domain)]
+
+    def _lookup(self, terms: List[Term],
+                skip: str = None) -> Optional[Dict[str, None]]:
+        hash_indexes = self.indexes[self._location]
+        ordered_indexes = self.ordered_indexes[self._location]
+
+        lookups: List[Tuple[Any, Any]] = []
+        bounds: Dict[str, List[Tuple[str, Any]]] = defaultdict(list)
+        for field, operator, value in terms:
+            if field in hash_indexes and operator in ('=', 'in'):
+                lookups.append((hash_indexes[field], [value] if
+                                operator == '=' else (value if isinstance(
+                                    value, list) else [])))
+            elif (field in ordered_indexes and field != skip and
+                  operator in self._range_operators):
+                bounds[field].append((operator, value))
+        lookups.extend((ordered_indexes[field], field_bounds)
+                       for field, field_bounds in bounds.items())
+
+        result: Optional[Dict[str, None]] = None
+        for index, argument in lookups:
+            try:
+                ids = index.lookup(argument)
+            except TypeError:
+                continue
+
+            if result is not None:
+                smaller, larger = sorted((ids, result), key=len)
+                ids = {id: None for id in smaller if id in larger}
+            result = ids
+
+        return result
+
+    @property
+    def _indexes(self) -> List[Union[HashIndex, OrderedIndex]]:
+        if not (self.index_fields or self.ordered_index_fields):
+            return []
+        return [*self.indexes[self._location].values(),
+                *self.ordered_indexes[self._location].values()]
+
     @property
     def _location(self) -> str:
         zone = self.locator.zone
@@ -0,0 +1,60 @@
+import heapq
+from operator import attrgetter
+from typing import Any, List, Sequence, Tuple
+
+
+def parse_order(order: str) -> List[Tuple[str, bool]]:
+    """Split an order string into (field, descending) pairs"""
+    fields = []
+    for field in order.lower().split(','):
+        key, *direction = field.split()
+        fields.append((key, 'desc' in direction))
+    return fields
+
+
+def sort_items(items: Sequence[Any],
+               fields: List[Tuple[str, bool]]) -> List[Any]:
+    """Stable sort of the items by the (field, descending) pairs"""
+    directions = {descending for _, descending in fields}
+    if len(directions) == 1:
+        return sorted(items, key=attrgetter(*[key for key, _ in fields]),
+                      reverse=directions.pop())
+
+    for key, descending in reversed(fields):
+        items = sorted(items, key=attrgetter(key), reverse=descending)
+    return list(items)
+
+
+def select_items(items: Sequence[Any], fields: List[Tuple[str, bool]],
+                 count: int) -> List[Any]:
+    """First count items of 'sort_items', selected with a heap"""
+    keys = [key for key, _ in fields]
+    first, descending = fields[0]
+    select = heapq.nlargest if descending else heapq.nsmallest
+    if len({descending for _, descending in fields}) == 1:
+        return select(count, items, key=attrgetter(*keys))
+
+    getter = attrgetter(first)
+    head = select(count, items, key=getter)
+    if not head:
+        return []
+
+    bound = getter(head[-1])
+    candidates = [item for item in items if (
+        getter(item) >= bound if descending else getter(item) <= bound)]
+    return sort_items(candidates, fields)[:count]
+
+
+def arrange(items: Sequence[Any], order: str = None,
+            limit: int = None, offset: int = None) -> List[Any]:
+    """Order the items, then apply the offset and limit"""
+    start = offset or 0
+    stop = None if limit is None else start + limit
+    if order:
+        fields = parse_order(order)
+        if stop is not None and stop * 32 < len(items):
+            items = select_items(items, fields, stop)
+        else:
+            items = sort_items(items, fields)
+
+    return list(items[start:stop])
@@ -85,8 +85,13 @@ class Repository(RepositoryInterface, Generic[T]):
 
         records = [value if isinstance(value, dict)
                    else {field: value} for value in values]
-        index = {getattr(item, field): item for item in await self.search(
-            [(field, 'in', [record.get(field) for record in records])])}
+        index = {getattr(item, field): item for item in await self._find_items(
+            field, [record.get(field) for record in records])}
 
         return [index.get(record.get(field), init and self.model(
             **record) or None) for record in records]
+
+    async def _find_items(self, field: str,
+                          values: List[Optional[Value]]) -> List[T]:
+        """Items whose field holds one of the given values"""
+        return await self.search([(field, 'in', values)])
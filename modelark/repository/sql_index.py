@@ -0,0 +1,79 @@
+from typing import Union
+from ..filterer import JSONB_CASTS, jsonb_field
+
+
+class SqlIndex:
+    """Expression index declaration over a jsonb field, or over the whole
+    collection for an empty gin field."""
+
+    casts = ('text', *JSONB_CASTS.values())
+    methods = ('btree', 'hash', 'gin')
+    operator_classes = ('jsonb_ops', 'jsonb_path_ops')
+    orders = ('', 'ASC', 'DESC', 'ASC NULLS FIRST', 'ASC NULLS LAST',
+              'DESC NULLS FIRST', 'DESC NULLS LAST')
+
+    def __init__(self, field: str, cast: str = 'text',
+                 unique: bool = False, where: str = '',
+                 method: str = 'btree', name: str = '',
+                 operators: str = '', order: str = '') -> None:
+        if cast not in self.casts:
+            raise ValueError(
+                f"Unsupported cast <{cast}>. Use one of {self.casts}.")
+        if method not in self.methods:
+            raise ValueError(
+                f"Unsupported method <{method}>. Use one of {self.methods}.")
+        if unique and method != 'btree':
+            raise ValueError("Only btree indexes can be unique.")
+        if (method == 'gin') == bool(field):
+            raise ValueError(
+                "Gin indexes are declared over the whole collection, "
+                "with an empty field, and only them.")
+        if order.upper() not in self.orders:
+            raise ValueError(
+                f"Unsupported order <{order}>. Use one of {self.orders}.")
+        if order and method != 'btree':
+            raise ValueError("Only btree indexes can be ordered.")
+        if operators and method != 'gin':
+            raise ValueError("Only gin indexes take operator classes.")
+        if operators and operators not in self.operator_classes:
+            raise ValueError(
+                f"Unsupported operators <{operators}>. "
+                f"Use one of {self.operator_classes}.")
+
+        self.field = field
+        self.cast = cast
+        self.unique = unique
+        self.where = where
+        self.method = method
+        self.name = name
+        self.operators = operators
+        self.order = order.upper()
+
+    @classmethod
+    def of(cls, index: Union[str, 'SqlIndex']) -> 'SqlIndex':
+        """Index declaration, taking field names as text btree indexes"""
+        return index if isinstance(index, SqlIndex) else cls(index)
+
+    def expression(self, collection: str) -> str:
+        if not self.field:
+            return collection
+        return jsonb_field(collection, self.field, self.cast)
+
+    def definition(self, table: str, namespace: str,
+                   collection: str) -> str:
+        """Statement concurrently creating the index on the table"""
+        unique = 'UNIQUE ' if self.unique else ''
+        where = f' WHERE {self.where}' if self.where else ''
+        expression = self.expression(collection)
+        if self.field:
+            expression = f"({expression})"
+        operators = f' {self.operators}' if self.operators else ''
+        operators += f' {self.order}' if self.order else ''
+        return (f"CREATE {unique}INDEX CONCURRENTLY IF NOT EXISTS "
+                f"{self.identifier(table)} ON {namespace} "
+                f"USING {self.method} ({expression}{operators}){where}")
+
+    def identifier(self, table: str) -> str:
+        if not self.field:
+            return self.name or f"{table}_document_{self.method}_index"
+        return self.name or f"{table}_{self.field}_{self.cast}_index"
@@ -1,60 +1,117 @@
 import time
 import json
+import asyncio
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from uuid import uuid4
+from weakref import WeakKeyDictionary
 from typing import (
-    List, Type, Tuple, Mapping, Generic, Callable, Union, overload)
+    Any, AsyncIterator, Awaitable, List, Type, Tuple, Mapping, MutableMapping,
+    Generic, Callable, Optional, Union, overload)
 from ..common import (
-    T, R, L, Locator, DefaultLocator, Editor, DefaultEditor)
-from ..filterer import Conditioner, SqlParser, SafeEval, Domain
-from ..connector import Connector
+    T, R, L, Value, Locator, DefaultLocator, Editor, DefaultEditor)
+from ..filterer import (
+    Conditioner, SqlParser, SafeEval, Domain, ParseCache)
+from ..connector import Connector, Connection
 from .repository import Repository
+from .sql_index import SqlIndex
 
 
 class SqlRepository(Repository, Generic[T]):
+    returning_modes = ('records', 'items', 'ids')
+
     def __init__(self,
                  table: str,
                  constructor: Callable[..., T],
                  connector: Connector,
                  conditioner: Conditioner = None,
                  locator: Locator = None,
-                 editor: Editor = None) -> None:
+                 editor: Editor = None,
+                 statement_cache_size: int = 0,
+                 search_path: bool = False,
+                 indexes: List[Union[str, SqlIndex]] = None,
+                 copy_threshold: int = 0,
+                 returning: str = 'records',
+                 batch_size: int = 0,
+                 concurrency: int = 1) -> None:
         self.max_items = 10_000
         self.jsonb_field = 'data'
         self.table = table
         self.constructor = constructor
         self.connector = connector
+        self.indexes: List[SqlIndex] = [
+            SqlIndex.of(index) for index in indexes or []]
         self.conditioner = conditioner or SqlParser(
-            jsonb_collection=self.jsonb_field)
+            jsonb_collection=self.jsonb_field, casts={
+                index.field: index.cast for index in self.indexes
+                if index.field})
         self.locator = locator or DefaultLocator('public')
         self.editor = editor or DefaultEditor()
+        self.statement_cache_size = statement_cache_size
+        self.statements: MutableMapping[Connection, ParseCache] = (
+            WeakKeyDictionary())
+        self.prepare_hits = 0
+        self.prepare_misses = 0
+        self.search_path = search_path
+        self.search_paths = ParseCache(128)
+        self.copy_threshold = copy_threshold
+        self.returning = returning
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+
+    async def add(self, item: Union[T, List[T]],
+                  returning: str = '') -> List[Any]:
+        """Upsert the items, returning their stored records, the items or
+        their ids."""
+        returning = returning or self.returning
+        if returning not in self.returning_modes:
+            raise ValueError(
+                f"Unsupported returning mode <{returning}>. "
+                f"Use one of {self.returning_modes}.")
 
-    async def add(self, item: Union[T, List[T]]) -> List[T]:
-        records = []
         items = item if isinstance(item, list) else [item]
-        for item in items:
-            item.updated_at = int(time.time())
-            item.updated_by = self.editor.reference
-            item.created_at = item.created_at or item.updated_at
-            item.created_by = item.created_by or item.updated_by
-            records.append((json.dumps(vars(item)),))
+        self._stamp(items)
 
-        namespace = f"{self.locator.location}.{self.table}"
-        query = f"""
-            INSERT INTO {namespace}({self.jsonb_field}) (
-                SELECT *
-                FROM unnest($1::{namespace}[]) AS d
-            )
-            ON CONFLICT (({self.jsonb_field}->>'id'))
-            DO UPDATE
-                SET {self.jsonb_field} = {namespace}.{self.jsonb_field} ||
-                EXCLUDED.{self.jsonb_field} - 'created_at' - 'created_by'
-            RETURNING *;
-        """
-        connection = await self.connector.get(self.locator.zone)
-        rows = await connection.fetch(query, records)
+        records = returning == 'records'
+
+        async def write(connection: Connection, chunk: List[T]) -> Any:
+            if self._copies(connection, chunk):
+                return await self._copy(connection, chunk, records)
+            query = self._upsert_query(
+                'SELECT *', f'unnest($1::{self._namespace(self.table)}[])'
+                ' AS d', returning=records)
+            arguments = [(json.dumps(vars(item)),) for item in chunk]
+            if records:
+                return await self._fetch(connection, query, arguments)
+            return await connection.execute(query, arguments)
+
+        results = await self._chunked(write, items)
+
+        if returning == 'items':
+            return items
+        if returning == 'ids':
+            return [item.id for item in items]
 
         return [self.constructor(**json.loads(row[self.jsonb_field]))
-                for row in rows if self.jsonb_field in row]
+                for rows in results for row in rows
+                if self.jsonb_field in row]
+
+    async def upsert(self, items: List[T]) -> int:
+        """Upsert the items without returning their stored records,
+        reporting the number of affected rows instead."""
+        if not items:
+            return 0
+        self._stamp(items)
+
+        async def write(connection: Connection, chunk: List[T]) -> str:
+            if self._copies(connection, chunk):
+                return await self._copy(connection, chunk, returning=False)
+            records = [(json.dumps(vars(item)),) for item in chunk]
+            return await connection.execute(self._upsert_query(
+                'SELECT *', f'unnest($1::{self._namespace(self.table)}[])'
+                ' AS d', returning=False), records)
+
+        return sum(int(status.split()[-1] or 0)
+                   for status in await self._chunked(write, items))
 
     async def search(self, domain: Domain,
                      limit: int = None, offset: int = None,
@@ -63,18 +120,19 @@ class SqlRepository(Repository, Generic[T]):
         condition, parameters = self.conditioner.parse(domain)
 
         select = f"SELECT {self.jsonb_field}"
-        from_ = f"FROM {self.locator.location}.{self.table}"
+        from_ = f"FROM {self._namespace(self.table)}"
         where = f"WHERE {condition}"
         group = ''
-        order_ = f"{self._order_by()}"
-        if order:
-            tokens = []
-            fields = order.split(',')
-            for field in fields:
-                key, *direction = field.split()
-                tokens.append(f"{self.jsonb_field}->>'{key}' "
-                              f"{next(iter(direction), '')}")
-            order_ = 'ORDER BY ' + ', '.join(tokens)
+        order_ = self._order_clause(order)
+
+        arguments = list(parameters)
+        limit_ = offset_ = ''
+        if limit is not None:
+            arguments.append(int(limit))
+            limit_ = f'LIMIT ${len(arguments)}'
+        if offset:
+            arguments.append(int(offset))
+            offset_ = f'OFFSET ${len(arguments)}'
 
         query = f"""\
         {select}
@@ -82,45 +140,124 @@ class SqlRepository(Repository, Generic[T]):
         {where}
         {group}
         {order_}
-        {f'LIMIT {limit}' if limit is not None else ''}
-        {f'OFFSET {offset}' if offset else ''}
+        {limit_}
+        {offset_}
         """
 
-        connection = await self.connector.get(self.locator.zone)
-        rows = await connection.fetch(query, *parameters)
+        connection = await self._connect()
+        rows = await self._fetch(connection, query, *arguments)
 
         return [self.constructor(**json.loads(row[self.jsonb_field]))
                 for row in rows if self.jsonb_field in row]
 
+    async def stream(self, domain: Domain, batch_size: int = 100,
+                     order: str = None) -> AsyncIterator[T]:
+        """Matching items, read through a server-side cursor a batch at a
+        time. Close streams left early with aclose() to end their
+        transaction. Unordered unless an order is given."""
+        condition, parameters = self.conditioner.parse(domain)
+
+        query = f"""
+            SELECT {self.jsonb_field}
+            FROM {self._namespace(self.table)}
+            WHERE {condition}
+            {self._order_clause(order) if order else ''}
+        """
+
+        connection = await self._connect()
+        if not hasattr(connection, 'cursor'):
+            for row in await connection.fetch(query, *parameters):
+                yield self.constructor(**json.loads(row[self.jsonb_field]))
+            return
+
+        async with connection.transaction():
+            cursor = await connection.cursor(query, *parameters)
+            while True:
+                rows = await cursor.fetch(batch_size)
+                items = [self.constructor(**json.loads(
+                    row[self.jsonb_field])) for row in rows]
+                for item in items:
+                    yield item
+                if len(rows) < batch_size:
+                    break
+
+    async def paginate(self, domain: Domain, limit: int,
+                       order: str = None, cursor: str = ''
+                       ) -> Tuple[List[T], str]:
+        """Page of the items after the cursor, seeking past its ordering
+        values, and the next page cursor, empty on the last one."""
+        order = order or 'created_at DESC NULLS LAST'
+        keys: List[Tuple[str, str]] = []
+        for field in order.split(','):
+            key, *direction = field.split()
+            keys.append((key, ' '.join(direction).upper()))
+        if 'id' not in [key for key, _ in keys]:
+            descending = keys[-1][1].startswith('DESC')
+            keys.append(('id', 'DESC' if descending else 'ASC'))
+
+        condition, parameters = self.conditioner.parse(domain)
+        where = f"WHERE ({condition})"
+        if cursor:
+            values = self._decode_cursor(cursor, order, len(keys))
+            seek, values = self._seek(keys, values, len(parameters) + 1)
+            where += f" AND {seek}"
+            parameters = (*parameters, *values)
+        parameters = (*parameters, int(limit) + 1)
+
+        order_ = ', '.join(
+            f"{self._order_field(key)} {direction}".strip()
+            for key, direction in keys)
+
+        query = f"""
+            SELECT {self.jsonb_field}
+            FROM {self._namespace(self.table)}
+            {where}
+            ORDER BY {order_}
+            LIMIT ${len(parameters)}
+        """
+
+        connection = await self._connect()
+        rows = await self._fetch(connection, query, *parameters)
+
+        records = [json.loads(row[self.jsonb_field])
+                   for row in rows if self.jsonb_field in row]
+        next_cursor = ''
+        if len(records) > limit:
+            records = records[:limit]
+            next_cursor = self._encode_cursor(
+                order, [key for key, _ in keys], records[-1])
+
+        return [self.constructor(**record) for record in records], next_cursor
+
     async def remove(self, item: Union[T, List[T]]) -> bool:
         if not item:
             return False
         items = item if isinstance(item, list) else [item]
         ids = [item.id for item in items]
-        placeholders = ", ".join(f'${i + 1}' for i in range(len(ids)))
 
         query = f"""
-            DELETE FROM {self.locator.location}.{self.table}
-            WHERE ({self.jsonb_field}->>'id') IN ({placeholders})
+            DELETE FROM {self._namespace(self.table)}
+            WHERE ({self.jsonb_field}->>'id') = ANY($1::text[])
         """
 
-        connection = await self.connector.get(self.locator.zone)
-        result = await connection.execute(query, *ids)
+        async def delete(connection: Connection, chunk: List[str]) -> str:
+            return await connection.execute(query, chunk)
 
-        return bool(int(result.replace('DELETE', '') or 0))
+        return bool(sum(int(result.replace('DELETE', '') or 0)
+                        for result in await self._chunked(delete, ids)))
 
     async def count(self, domain: Domain = None) -> int:
         condition, parameters = self.conditioner.parse(domain or [])
 
         query = f"""
             SELECT count(*) as count
-            FROM {self.locator.location}.{self.table}
+            FROM {self._namespace(self.table)}
             WHERE {condition}
         """
 
-        connection = await self.connector.get(self.locator.zone)
+        connection = await self._connect()
         result: Mapping[str, int] = next(
-            iter(await connection.fetch(query, *parameters)), {})
+            iter(await self._fetch(connection, query, *parameters)), {})
 
         return result.get('count', 0)
 
@@ -134,7 +271,7 @@ class SqlRepository(Repository, Generic[T]):
         condition, parameters = self.conditioner.parse(domain)
 
         select = f"SELECT {self.jsonb_field}"
-        from_ = f"FROM {self.locator.location}.{self.table}"
+        from_ = f"FROM {self._namespace(self.table)}"
         where = f"WHERE {condition}"
         group = ''
         order = f"{self._order_by()}"
@@ -158,13 +295,13 @@ class SqlRepository(Repository, Generic[T]):
         elif pivot:
             target = target or f'{join.model.__name__.lower()}_id'
             link_jsonb_field = getattr(link, 'jsonb_field')
-            on += (f"        JOIN {self.locator.location}.{join_table} "
+            on += (f"        JOIN {self._namespace(join_table)} "
                    f"ON {link_table}.{link_jsonb_field}->>'{target}' = "
                    f"{join_table}.{join_jsonb_field}->>'id'\n")
 
         from_ = (
-            f"FROM {self.locator.location}.{self.table} "
-            f"LEFT JOIN {self.locator.location}.{link_table}\n"
+            f"FROM {self._namespace(self.table)} "
+            f"LEFT JOIN {self._namespace(link_table)}\n"
             f"        {on}")
         group = f"GROUP BY {self.table}.{self.jsonb_field}"
 
@@ -176,8 +313,8 @@ class SqlRepository(Repository, Generic[T]):
         {order}
         """
 
-        connection = await self.connector.get(self.locator.zone)
-        rows = await connection.fetch(query, *parameters)
+        connection = await self._connect()
+        rows = await self._fetch(connection, query, *parameters)
 
         records = []
         join_constructor = getattr(join, 'constructor')
@@ -189,5 +326,286 @@ class SqlRepository(Repository, Generic[T]):
 
         return records
 
+    async def ensure_indexes(self) -> List[str]:
+        """Concurrently create the declared indexes that are missing or
+        invalid, returning their names."""
+        names = [index.identifier(self.table) for index in self.indexes]
+        if not names:
+            return names
+
+        connection = await self._connect()
+        invalid = await connection.fetch("""
+            SELECT class.relname
+            FROM pg_index AS index
+            JOIN pg_class AS class ON class.oid = index.indexrelid
+            JOIN pg_namespace AS namespace
+                ON namespace.oid = class.relnamespace
+            WHERE namespace.nspname = $1
+                AND class.relname = ANY($2::text[])
+                AND NOT index.indisvalid
+        """, self.locator.location, names)
+
+        for row in invalid:
+            await connection.execute(
+                "DROP INDEX CONCURRENTLY IF EXISTS "
+                f"{self._namespace(row['relname'])}")
+
+        for index in self.indexes:
+            await connection.execute(index.definition(
+                self.table, self._namespace(self.table), self.jsonb_field))
+
+        return names
+
+    async def _find_items(self, field: str,
+                          values: List[Optional[Value]]) -> List[T]:
+        """Items whose field holds one of the values, looked up a batch
+        of values at a time."""
+        async def fetch(connection: Connection,
+                        chunk: List[Optional[Value]]) -> List[Mapping]:
+            condition, parameters = self.conditioner.parse(
+                [(field, 'in', chunk)])
+            return await self._fetch(connection, f"""
+                SELECT {self.jsonb_field}
+                FROM {self._namespace(self.table)}
+                WHERE {condition}
+            """, *parameters)
+
+        return [self.constructor(**json.loads(row[self.jsonb_field]))
+                for rows in await self._chunked(
+                    fetch, values, self.concurrency)
+                for row in rows if self.jsonb_field in row]
+
+    async def _chunked(self, function: Callable[..., Awaitable],
+                       values: List, concurrency: int = 1) -> List:
+        """Results of the function over the values batches, in order"""
+        size = self.batch_size or len(values) or 1
+        chunks = [values[start:start + size]
+                  for start in range(0, len(values), size)]
+
+        connections: List[Connection] = []
+        while len(connections) < min(max(concurrency, 1), len(chunks)):
+            connection = await self._connect()
+            if any(connection is other for other in connections):
+                break
+            connections.append(connection)
+
+        results: List[Any] = [None] * len(chunks)
+        pending = iter(enumerate(chunks))
+
+        async def work(connection: Connection) -> None:
+            for position, chunk in pending:
+                results[position] = await function(connection, chunk)
+
+        workers = [asyncio.ensure_future(work(connection))
+                   for connection in connections]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
+
+        return results
+
+    def _stamp(self, items: List[T]) -> None:
+        for item in items:
+            item.updated_at = int(time.time())
+            item.updated_by = self.editor.reference
+            item.created_at = item.created_at or item.updated_at
+            item.created_by = item.created_by or item.updated_by
+
+    def _upsert_query(self, select: str, source: str,
+                      returning: bool = True) -> str:
+        namespace = self._namespace(self.table)
+        return f"""
+            INSERT INTO {namespace}({self.jsonb_field}) (
+                {select}
+                FROM {source}
+            )
+            ON CONFLICT (({self.jsonb_field}->>'id'))
+            DO UPDATE
+                SET {self.jsonb_field} = {namespace}.{self.jsonb_field} ||
+                EXCLUDED.{self.jsonb_field} - 'created_at' - 'created_by'
+            {'RETURNING *' if returning else ''};
+        """
+
+    def _copies(self, connection: Connection, items: List[T]) -> bool:
+        """Whether the items are written through the COPY bulk path"""
+        return bool(self.copy_threshold) and len(
+            items) >= self.copy_threshold and hasattr(
+                connection, 'copy_records_to_table')
+
+    async def _copy(self, connection: Connection, items: List[T],
+                    returning: bool) -> Any:
+        """Upsert the items through a binary COPY to a staging table"""
+        staging = f"{self.table}_staging_{uuid4().hex}"
+        records = ((json.dumps(vars(item)),) for item in items)
+        query = self._upsert_query(
+            f'SELECT {self.jsonb_field}', staging, returning)
+
+        async with connection.transaction():
+            await connection.execute(
+                f"CREATE TEMPORARY TABLE {staging} "
+                f"({self.jsonb_field} jsonb) ON COMMIT DROP")
+            await connection.copy_records_to_table(
+                staging, records=records, columns=[self.jsonb_field])
+            result = await (connection.fetch(query) if returning
+                            else connection.execute(query))
+            await connection.execute(f"DROP TABLE {staging}")
+
+        return result
+
+    async def _connect(self) -> Connection:
+        """Connection of the locator zone, whose session search path is
+        pointed to the locator location schema in search path mode, only
+        when it changes. Pools must reset sessions on release."""
+        connection = await self.connector.get(self.locator.zone)
+        if not self.search_path:
+            return connection
+
+        location = self.locator.location
+        entry = self.search_paths.get(id(connection))
+        if entry and entry[0] is connection and entry[1] == location:
+            return connection
+
+        await connection.execute(
+            "SELECT set_config('search_path', $1, false)", location)
+        in_transaction = getattr(connection, 'is_in_transaction', None)
+        if not (in_transaction and in_transaction()):
+            self.search_paths.put(id(connection), (connection, location))
+
+        return connection
+
+    async def _fetch(self, connection: Connection,
+                     query: str, *args) -> List[Mapping]:
+        """Fetch the query records through a statement prepared once per
+        connection and query text, when the statement cache is enabled
+        and the connection supports it."""
+        if not self.statement_cache_size or not hasattr(
+                connection, 'prepare'):
+            return await connection.fetch(query, *args)
+
+        owner = getattr(connection, '_con', None) or connection
+        try:
+            statements = self.statements.get(owner)
+            if statements is None:
+                statements = self.statements[owner] = ParseCache(
+                    self.statement_cache_size)
+        except TypeError:
+            return await connection.fetch(query, *args)
+
+        statement = statements.get(query)
+        if statement is None:
+            self.prepare_misses += 1
+            statement = await connection.prepare(query)
+            statements.put(query, statement)
+        else:
+            self.prepare_hits += 1
+
+        try:
+            return await statement.fetch(*args)
+        except Exception:
+            statements.pop(query)
+            raise
+
+    def _namespace(self, table: str) -> str:
+        """Table reference, qualified with the locator location schema
+        unless it is resolved through the search path."""
+        if self.search_path:
+            return table
+        return f"{self.locator.location}.{table}"
+
+    def _order_field(self, key: str) -> str:
+        """Ordering expression of a field, cast as in its declared index
+        so that it sorts by value and the index can provide the order."""
+        index = self._order_index(key)
+        if index is not None:
+            return index.expression(self.jsonb_field)
+        return f"{self.jsonb_field}->>'{key}'"
+
+    def _order_index(self, key: str) -> Optional[SqlIndex]:
+        return next((index for index in self.indexes
+                     if index.field == key), None)
+
+    def _seek(self, keys: List[Tuple[str, str]], values: List[Any],
+              start: int) -> Tuple[str, List[Any]]:
+        """Condition of the rows ordered after the given ordering values,
+        along with the non null ones, bound from the start placeholder."""
+        rows: List[Tuple[str, str, str]] = []
+        terms: List[Tuple[str, str]] = []
+        bound: List[Any] = []
+        for (key, direction), value in zip(keys, values):
+            field = self._order_field(key)
+            descending = direction.startswith('DESC')
+            nulls_first = 'NULLS FIRST' in direction or (
+                descending and 'NULLS' not in direction)
+            if value is None:
+                terms.append((f"{field} IS NOT NULL" if nulls_first else '',
+                              f"{field} IS NULL"))
+                continue
+
+            bound.append(value)
+            placeholder = f'${start + len(bound) - 1}'
+            operator = '<' if descending else '>'
+            after = f"{field} {operator} {placeholder}"
+            if not nulls_first and key != 'id':
+                after = f"({after} OR {field} IS NULL)"
+            else:
+                rows.append((field, operator, placeholder))
+            terms.append((after, f"{field} = {placeholder}"))
+
+        if len(rows) == len(terms) and len({
+                operator for _, operator, _ in rows}) == 1:
+            fields = ', '.join(field for field, _, _ in rows)
+            placeholders = ', '.join(
+                placeholder for _, _, placeholder in rows)
+            return f"({fields}) {rows[0][1]} ({placeholders})", bound
+
+        seek = ''
+        for after, equal in reversed(terms):
+            if not seek:
+                seek = after
+            elif after:
+                seek = f"({after} OR ({equal} AND {seek}))"
+            else:
+                seek = f"({equal} AND {seek})"
+        return seek, bound
+
+    def _encode_cursor(self, order: str, keys: List[str],
+                       record: Mapping[str, Any]) -> str:
+        values = []
+        for key in keys:
+            value = record.get(key)
+            index = self._order_index(key)
+            if (index is None or index.cast == 'text') and not isinstance(
+                    value, (str, type(None))):
+                value = json.dumps(value)
+            values.append(value)
+
+        return urlsafe_b64encode(
+            json.dumps([order, values]).encode()).decode()
+
+    def _decode_cursor(self, cursor: str, order: str,
+                       length: int) -> List[Any]:
+        try:
+            cursor_order, values = json.loads(urlsafe_b64decode(cursor))
+        except (ValueError, TypeError):
+            raise ValueError(f"Invalid pagination cursor <{cursor}>.")
+        if cursor_order != order or len(values) != length:
+            raise ValueError(
+                f"The pagination cursor doesn't match the order <{order}>.")
+        return values
+
+    def _order_clause(self, order: str = None) -> str:
+        if not order:
+            return self._order_by()
+        tokens = []
+        for field in order.split(','):
+            key, *direction = field.split()
+            tokens.append(f"{self._order_field(key)} "
+                          f"{next(iter(direction), '')}")
+        return 'ORDER BY ' + ', '.join(tokens)
+
     def _order_by(self) -> str:
-        return f"ORDER BY {self.jsonb_field}->>'created_at' DESC NULLS LAST"
+        return f"ORDER BY {self._order_field('created_at')} DESC NULLS LAST"
@@ -0,0 +1,191 @@
+import time
+import json
+import sqlite3
+import asyncio
+from pathlib import Path
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Generic, List, Tuple, Union
+from ..common import (
+    T, R, L, Locator, DefaultLocator, Editor, DefaultEditor)
+from ..filterer import Conditioner, SqliteParser, Domain, json_field
+from .repository import Repository
+
+
+class SqliteRepository(Repository, Generic[T]):
+    """Repository of json records in local SQLite database files"""
+
+    def __init__(self,
+                 data_path: str,
+                 table: str,
+                 constructor: Callable[..., T],
+                 conditioner: Conditioner = None,
+                 locator: Locator = None,
+                 editor: Editor = None,
+                 indexes: List[str] = None) -> None:
+        self.max_items = 10_000
+        self.jsonb_field = 'data'
+        self.data_path = data_path
+        self.table = table
+        self.constructor = constructor
+        self.conditioner = conditioner or SqliteParser(
+            jsonb_collection=self.jsonb_field)
+        self.locator = locator or DefaultLocator()
+        self.editor = editor or DefaultEditor()
+        self.indexes: List[str] = indexes or []
+        self.connections: Dict[str, sqlite3.Connection] = {}
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    async def add(self, item: Union[T, List[T]]) -> List[T]:
+        records = []
+        items = item if isinstance(item, list) else [item]
+        for item in items:
+            item.updated_at = int(time.time())
+            item.updated_by = self.editor.reference
+            item.created_at = item.created_at or item.updated_at
+            item.created_by = item.created_by or item.updated_by
+            records.append((item.id, json.dumps(vars(item))))
+
+        created = [f"'$.{key}', json_extract({self.table}.{self.jsonb_field}"
+                   f", '$.{key}')" for key in ('created_at', 'created_by')]
+        query = f"""
+            INSERT INTO {self.table}(id, {self.jsonb_field})
+            VALUES (?, json(?))
+            ON CONFLICT (id)
+            DO UPDATE
+                SET {self.jsonb_field} = json_set(json_patch(
+                    {self.table}.{self.jsonb_field},
+                    EXCLUDED.{self.jsonb_field}), {', '.join(created)})
+        """
+        rows = await self._run(self._upsert, query, records)
+
+        return [self.constructor(**json.loads(row[1])) for row in rows]
+
+    async def search(self, domain: Domain,
+                     limit: int = None, offset: int = None,
+                     order: str = None) -> List[T]:
+
+        condition, parameters = self.conditioner.parse(domain)
+
+        order_ = self._order_by()
+        if order:
+            tokens = []
+            for field in order.split(','):
+                key, *direction = field.split()
+                tokens.append(f"{json_field(self.jsonb_field, key)} "
+                              f"{next(iter(direction), '')}".strip())
+            order_ = 'ORDER BY ' + ', '.join(tokens)
+
+        query = f"""
+            SELECT {self.jsonb_field}
+            FROM {self.table}
+            WHERE {condition}
+            {order_}
+            LIMIT {-1 if limit is None else int(limit)}
+            OFFSET {int(offset or 0)}
+        """
+
+        rows = await self._run(self._fetch, query, parameters)
+
+        return [self.constructor(**json.loads(row[0])) for row in rows]
+
+    async def remove(self, item: Union[T, List[T]]) -> bool:
+        if not item:
+            return False
+        items = item if isinstance(item, list) else [item]
+        ids = [item.id for item in items]
+
+        query = f"""
+            DELETE FROM {self.table}
+            WHERE id IN (SELECT value FROM json_each(?))
+        """
+
+        deleted = await self._run(self._execute, query, (json.dumps(ids),))
+
+        return bool(deleted)
+
+    async def count(self, domain: Domain = None) -> int:
+        condition, parameters = self.conditioner.parse(domain or [])
+
+        query = f"""
+            SELECT count(*) as count
+            FROM {self.table}
+            WHERE {condition}
+        """
+
+        rows = await self._run(self._fetch, query, parameters)
+
+        return next(iter(rows), (0,))[0]
+
+    async def close(self) -> None:
+        await self._run(self._close)
+        self.executor.shutdown()
+
+    async def _run(self, function: Callable, *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, partial(function, *args))
+
+    def _fetch(self, query: str, parameters: Tuple) -> List[sqlite3.Row]:
+        return self._connect().execute(query, parameters).fetchall()
+
+    def _execute(self, query: str, parameters: Tuple) -> int:
+        connection = self._connect()
+        with connection:
+            return connection.execute(query, parameters).rowcount
+
+    def _upsert(self, query: str, records: List[Tuple]) -> List[Tuple]:
+        """Write the records, returning their stored (id, data) rows in
+        the given order"""
+        ids = [record[0] for record in records]
+        connection = self._connect()
+        with connection:
+            connection.executemany(query, records)
+            rows = dict(connection.execute(f"""
+                SELECT id, {self.jsonb_field} FROM {self.table}
+                WHERE id IN (SELECT value FROM json_each(?))
+            """, (json.dumps(ids),)).fetchall())
+        return [(id, rows[id]) for id in ids if id in rows]
+
+    def _connect(self) -> sqlite3.Connection:
+        """Connection to the current location database, which is
+        created along with the table and its indexes if missing."""
+        path = str(self.database_path)
+        connection = self.connections.get(path)
+        if connection is not None:
+            return connection
+
+        self.database_path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(path)
+        connection.execute('PRAGMA journal_mode = WAL')
+        connection.execute('PRAGMA synchronous = NORMAL')
+        connection.execute('PRAGMA busy_timeout = 5000')
+        with connection:
+            connection.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.table} (
+                    id TEXT PRIMARY KEY,
+                    {self.jsonb_field} TEXT NOT NULL
+                )
+            """)
+            for field in self.indexes:
+                connection.execute(f"""
+                    CREATE INDEX IF NOT EXISTS {self.table}_{field}_index
+                    ON {self.table} ({json_field(self.jsonb_field, field)})
+                """)
+
+        self.connections[path] = connection
+        return connection
+
+    def _close(self) -> None:
+        for connection in self.connections.values():
+            connection.close()
+        self.connections.clear()
+
+    def _order_by(self) -> str:
+        created_at = json_field(self.jsonb_field, 'created_at')
+        return f"ORDER BY {created_at} DESC NULLS LAST"
+
+    @property
+    def database_path(self) -> Path:
+        return (Path(self.data_path) / self.locator.zone /
+                f"{self.locator.location}.sqlite3")
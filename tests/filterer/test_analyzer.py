@@ -0,0 +1,65 @@
+from modelark.filterer import conjuncts, split
+
+
+def test_conjuncts_empty():
+    assert conjuncts([]) == []
+
+
+def test_conjuncts_default_join():
+    domain = [('a', '=', 1), ['b', 'in', [2]], ('c', '>', 3)]
+
+    assert conjuncts(domain) == [
+        ('a', '=', 1), ('b', 'in', [2]), ('c', '>', 3)]
+
+
+def test_conjuncts_skip_disjunctions():
+    domain = [('a', '=', 1), '|', ('b', '=', 2), ('c', '=', 3),
+              '!', ('d', '=', 4), '&', ('e', '=', 5), ('f', '=', 6)]
+
+    assert conjuncts(domain) == [('a', '=', 1)]
+
+
+def test_conjuncts_skip_negations():
+    domain = ['!', ('d', '=', 4), '&', ('e', '=', 5), ('f', '=', 6)]
+
+    assert conjuncts(domain) == [('e', '=', 5), ('f', '=', 6)]
+
+
+def test_conjuncts_root_disjunction():
+    domain = ['|', ('a', '=', 1), ('b', '=', 2), ('c', '=', 3)]
+
+    assert conjuncts(domain) == []
+
+
+def test_split_conjuncts():
+    equal = lambda term: term[1] == '='
+
+    assert split([], equal) == ([], [])
+    assert split([('a', '=', 1), ('b', '>', 2), ('c', '=', 3)], equal) == (
+        [('a', '=', 1), ('c', '=', 3)], [('b', '>', 2)])
+    assert split([('a', '=', 1), ('c', '=', 3)], equal) == (
+        [('a', '=', 1), ('c', '=', 3)], [])
+
+
+def test_split_keeps_disjunctions_and_negations():
+    equal = lambda term: term[1] == '='
+    domain = [('a', '=', 1), '|', ('b', '=', 2), ('c', '=', 3),
+              '!', ('d', '=', 4), '&', ('e', '=', 5), ('f', '<', 6)]
+
+    taken, remaining = split(domain, equal)
+
+    assert taken == [('a', '=', 1)]
+    assert remaining == ['|', ('b', '=', 2), ('c', '=', 3),
+                         '!', ('d', '=', 4), '&', ('e', '=', 5),
+                         ('f', '<', 6)]
+
+
+def test_split_explicit_conjunctions():
+    equal = lambda term: term[1] == '='
+    domain = ['&', ('a', '=', 1), ('b', '<', 2), '!', ('c', '=', 3),
+              ('d', '=', 4)]
+
+    taken, remaining = split(domain, equal)
+
+    assert taken == [('a', '=', 1), ('d', '=', 4)]
+    assert remaining == [('b', '<', 2), '!', ('c', '=', 3)]
@@ -211,3 +211,98 @@ class TestFunctionParser(unittest.TestCase):
         mock_object = {'field': 7}
 
         self.assertTrue(result(mock_object))
+
+    def test_function_parser_compiled_multiple_terms(self):
+        parser = FunctionParser(compiled=True)
+        test_domains = [
+            ([('field', '=', 7), ('field2', '!=', 8)],
+             lambda obj: (obj.field2 != 8 and obj.field == 7)),
+            (['|', ('field', '=', 7), ('field2', '!=', 8)],
+             lambda obj: (obj.field2 != 8 or obj.field == 7)),
+            (['|', ('field', '=', 7), '!', ('field2', '!=', 8),
+              ('field3', '>=', 9)],
+             lambda obj: (obj.field == 7 or
+                          not obj.field2 != 8 and obj.field3 >= 9)),
+            (['!', '|', ('field', '=', 7), ('field2', '<', 8)],
+             lambda obj: not (obj.field == 7 or obj.field2 < 8)),
+            ([('field', 'in', [7, 9]), ('field2', '>', 1)],
+             lambda obj: obj.field in [7, 9] and obj.field2 > 1),
+            ([('field', 'in', 7)], lambda obj: False),
+            ([('field', 'in', [[7]])], lambda obj: obj.field in [[7]]),
+            ([('field2', '<=', 8), ('field3', 'contains', 3)],
+             lambda obj: obj.field2 <= 8 and 3 in obj.field3)
+        ]
+
+        objects = [Mock(field=7, field2=8, field3=[9]),
+                   Mock(field=5, field2=7, field3=[3]),
+                   Mock(field=9, field2=9, field3=[1, 3])]
+
+        for domain, expected in test_domains:
+            result = parser.parse(domain)
+            for obj in objects:
+                self.assertEqual(result(obj), expected(obj))
+
+    def test_function_parser_compiled_like(self):
+        parser = FunctionParser(compiled=True)
+        test_domains = [
+            ([('field', 'like', 'Hello%')], Mock(field='Hello World'), True),
+            ([('field', 'like', 'Hello_')], Mock(field='HelloX'), True),
+            ([('field', 'like', '%world')], Mock(field='Hello World'), False),
+            ([('field', 'ilike', '%eLLo%')], Mock(field='HELLO world'), True),
+            ([('field', 'like', 'Hello%')], Mock(field=9), False)
+        ]
+
+        for domain, obj, expected in test_domains:
+            self.assertEqual(parser.parse(domain)(obj), expected)
+
+    def test_function_parser_compiled_field_names(self):
+        parser = FunctionParser(compiled=True)
+        domain = [('class', '=', 7), ('field; import os', '=', 5)]
+
+        result = parser.parse(domain)
+
+        self.assertTrue(result({'class': 7, 'field; import os': 5}))
+        self.assertFalse(result({'class': 7, 'field; import os': 6}))
+
+    def test_function_parser_compiled_evaluator_and_namespaces(self):
+        parser = FunctionParser(SafeEval(), compiled=True)
+
+        result = parser.parse([('field', '=', '>>> 3 + value')], {'value': 4})
+        self.assertTrue(result(Mock(field=7)))
+
+        result = parser.parse([('orders.customer_id', '=', 'customers.id')],
+                              namespaces=['orders', 'customers'])
+        self.assertTrue(result(
+            ({'id': '77', 'customer_id': '03'}, {'id': '03'})))
+
+    def test_function_parser_compiled_long_domain(self):
+        parser = FunctionParser(compiled=True)
+        domain = [('field', '!=', value) for value in range(500)]
+
+        result = parser.parse(domain)
+
+        self.assertTrue(result(Mock(field=500)))
+        self.assertFalse(result(Mock(field=250)))
+
+    def test_function_parser_compiled_cache(self):
+        parser = FunctionParser(compiled=True, cache_size=2)
+
+        first = parser.parse([('field', '=', 7), ('field2', 'in', [1])])
+        second = parser.parse([('field', '=', 5), ('field2', 'in', [2])])
+
+        self.assertTrue(first(Mock(field=7, field2=1)))
+        self.assertFalse(first(Mock(field=5, field2=2)))
+        self.assertTrue(second(Mock(field=5, field2=2)))
+        self.assertEqual((parser.cache.hits, parser.cache.misses), (1, 1))
+
+    def test_function_parser_compiled_unhashable_in(self):
+        for compiled in (False, True):
+            parser = FunctionParser(compiled=compiled)
+
+            self.assertFalse(parser.parse([('f', 'in', [1, 2])])(
+                Mock(f=[1])))
+            self.assertTrue(parser.parse([('f', 'in', [[1], 2])])(
+                Mock(f=[1])))
+            self.assertTrue(parser.parse([('f', 'in', [[1], 2])])(
+                Mock(f=2)))
+            self.assertFalse(parser.parse([('f', 'in', 3)])(Mock(f=3)))
@@ -0,0 +1,67 @@
+from threading import Thread
+from modelark.filterer import ParseCache, fingerprint
+
+
+def test_parse_cache_get_and_put():
+    cache = ParseCache()
+
+    assert cache.get('key') is None
+    cache.put('key', 'value')
+
+    assert cache.get('key') == 'value'
+    assert len(cache) == 1
+    assert (cache.hits, cache.misses, cache.evictions) == (1, 1, 0)
+
+
+def test_parse_cache_eviction():
+    cache = ParseCache(maxsize=2)
+
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+
+    assert len(cache) == 2
+    assert cache.evictions == 1
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+
+
+def test_parse_cache_clear():
+    cache = ParseCache()
+    cache.put('a', 1)
+    cache.get('a')
+
+    cache.clear()
+
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses, cache.evictions) == (0, 0, 0)
+
+
+def test_parse_cache_threads():
+    cache = ParseCache(maxsize=8)
+
+    def work(offset):
+        for index in range(1000):
+            key = (index + offset) % 16
+            if cache.get(key) is None:
+                cache.put(key, key)
+
+    threads = [Thread(target=work, args=(offset,)) for offset in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(cache) == 8
+    assert cache.hits + cache.misses == 4000
+
+
+def test_fingerprint_separates_shape_from_values():
+    assert fingerprint([('field', '=', 1)]) == fingerprint(
+        [['field', '=', 2]])
+    assert fingerprint([('field', '=', 1)]) != fingerprint(
+        [('field', '=', '1')])
+    assert fingerprint(['|', ('a', '=', 1), ('b', 'in', [1])]) == (
+        '|', ('a', '=', 'int'), ('b', 'in', 'list'))
@@ -184,3 +184,65 @@ class TestSqlParser(unittest.TestCase):
             "(data->>'field_4')::text = $4"
         )
         assert params == (3, True, 7, 'world')
+
+    def test_sql_parser_cache(self):
+        parser = SqlParser(SafeEval(), jsonb_collection='data', cache_size=2)
+
+        first = parser.parse([('field_1', '=', 3), ('field_2', 'in', [1])])
+        second = parser.parse([('field_1', '=', 4), ('field_2', 'in', [2])])
+        third = parser.parse([('field_1', '=', '>>> 2 + value')],
+                             {'value': 3})
+        fourth = parser.parse([('field_1', '=', 'text')])
+
+        assert first == (
+            "(data->>'field_1')::integer = $1 AND "
+            "(data->>'field_2')::text = ANY($2)", (3, [1]))
+        assert second == (first[0], (4, [2]))
+        assert third == ("(data->>'field_1')::text = $1", (5,))
+        assert fourth == (third[0], ('text',))
+        assert (parser.cache.hits, parser.cache.misses) == (2, 2)
+
+    def test_sql_parser_containment(self):
+        parser = SqlParser(SafeEval(), jsonb_collection='data',
+                           containment=True, cache_size=2)
+
+        first = parser.parse([('status', '=', 'active'), ('amount', '>', 5),
+                              ('kind', '=', '>>> value'),
+                              ('status', '=', 'closed')], {'value': 'order'})
+        second = parser.parse([('status', '=', 'closed'), ('amount', '>', 7),
+                               ('kind', '=', 'sale'), ('status', '=', 'x')])
+        third = parser.parse([('amount', '=', 5), '|',
+                              ('kind', '=', 'order'), ('rank', '=', None)])
+
+        assert first == (
+            "data @> $1::jsonb AND (data->>'amount')::integer > $2 AND "
+            "(data->>'status')::text = $3",
+            ('{"status": "active", "kind": "order"}', 5, 'closed'))
+        assert second == (
+            first[0], ('{"status": "closed", "kind": "sale"}', 7, 'x'))
+        assert third == (
+            "data @> $1::jsonb AND (data->>'kind')::text = $2 OR "
+            "(data->>'rank')::text = $3", ('{"amount": 5}', 'order', None))
+        assert (parser.cache.hits, parser.cache.misses) == (1, 2)
+
+    def test_sql_parser_declared_casts(self):
+        parser = SqlParser(jsonb_collection='data', cache_size=2, casts={
+            'amount': 'float', 'created_at': 'text'})
+
+        first = parser.parse([('amount', '>', 5), ('created_at', '>', 3),
+                              ('rank', '=', 1)])
+        second = parser.parse([('amount', 'in', [1, 2]),
+                               ('created_at', 'in', [1, 'a', True])])
+        third = parser.parse([('amount', '>', 7), ('created_at', '>', 4),
+                              ('rank', '=', 2)])
+
+        assert first == (
+            "(data->>'amount')::float > $1 AND "
+            "(data->>'created_at')::text > $2 AND "
+            "(data->>'rank')::integer = $3", (5, '3', 1))
+        assert second == (
+            "(data->>'amount')::float = ANY($1) AND "
+            "(data->>'created_at')::text = ANY($2)",
+            ([1, 2], ['1', 'a', 'true']))
+        assert third == (first[0], (7, '4', 2))
+        assert parser.cache.hits == 1
@@ -0,0 +1,41 @@
+from modelark.filterer import SqliteParser, SqlParser
+
+
+def test_sqlite_parser_json_fields():
+    parser = SqliteParser(jsonb_collection='data')
+
+    assert isinstance(parser, SqlParser)
+    assert parser.parse([('field', '=', 7), ('name', 'like', 'a_b%*')]) == (
+        "json_extract(data, '$.field') = ? AND "
+        "json_extract(data, '$.name') GLOB ?", (7, 'a?b*[*]'))
+
+
+def test_sqlite_parser_operators():
+    parser = SqliteParser()
+
+    assert parser.parse([('field', 'in', ['a', 1])]) == (
+        'field IN (SELECT value FROM json_each(?))', ('["a", 1]',))
+    assert parser.parse([('field', 'ilike', 'A%')]) == (
+        'field LIKE ?', ('A%',))
+    assert parser.parse([('tags', 'contains', 'x')]) == (
+        'EXISTS (SELECT 1 FROM json_each(tags) WHERE value = ?)', ('x',))
+
+
+def test_sqlite_parser_precedence():
+    parser = SqliteParser()
+
+    assert parser.parse([('c', '=', 3), '|', ('a', '=', 1),
+                         ('b', '=', 2)]) == (
+        'c = ? AND (a = ? OR b = ?)', (3, 1, 2))
+    assert parser.parse(['!', '&', ('a', '=', 1), ('b', '=', 2)]) == (
+        'NOT (a = ? AND b = ?)', (1, 2))
+
+
+def test_sqlite_parser_cache():
+    parser = SqliteParser(jsonb_collection='data', cache_size=8)
+
+    parser.parse([('field', 'in', ['a'])])
+    condition, parameters = parser.parse([('field', 'in', ['b', 'c'])])
+
+    assert parser.cache.hits == 1
+    assert parameters == ('["b", "c"]',)
@@ -0,0 +1,53 @@
+from pytest import raises, mark
+from modelark.repository.json_format import encode, decode, detect
+
+
+FORMATS = ['json', 'compact', 'gzip', 'lzma', 'pickle', 'marshal']
+
+
+@mark.parametrize('format', FORMATS)
+def test_json_format_round_trip(format):
+    data = {'alphas': {'1': {'id': '1', 'name': 'ñandú', 'amount': 1.5,
+                             'tags': ['a', None, True]}}}
+
+    content = encode(data, format)
+
+    assert isinstance(content, bytes)
+    assert detect(content) == ('json' if format == 'compact' else format)
+    assert decode(content, format) == data
+
+
+def test_json_format_sizes():
+    data = {'alphas': {str(index): {'id': str(index), 'name': 'alpha'}
+                       for index in range(100)}}
+
+    json, compact, gzip = [
+        len(encode(data, format)) for format in ('json', 'compact', 'gzip')]
+
+    assert compact < json
+    assert gzip < compact
+    assert b' ' not in encode(data, 'compact')
+
+
+@mark.parametrize('format', ['pickle', 'marshal'])
+def test_json_format_binary_opt_in(format):
+    content = encode({'alphas': {}}, format)
+
+    for other in ('json', 'gzip', 'pickle', 'marshal'):
+        if other != format:
+            with raises(ValueError):
+                decode(content, other)
+    with raises(ValueError):
+        decode(content)
+
+
+def test_json_format_detects_json_formats():
+    data = {'alphas': {'1': {'id': '1'}}}
+
+    for format in ('json', 'compact', 'gzip', 'lzma'):
+        assert decode(encode(data, format)) == data
+
+
+def test_json_format_unsupported():
+    with raises(ValueError):
+        encode({}, 'yaml')
@@ -1,7 +1,11 @@
+import asyncio
+import fcntl
+import threading
 from json import dumps, loads
-from pytest import fixture, mark
+from pytest import fixture, mark, raises
 from modelark.common import Entity, DefaultLocator
-from modelark.repository import Repository, JsonRepository
+from modelark.repository import Repository, JsonRepository, json_repository
+from modelark.repository.json_repository import locked_open
 
 
 pytestmark = mark.asyncio
@@ -212,3 +216,567 @@ async def test_json_repository_count_domain(alpha_json_repository):
     domain = [('id', '=', "1")]
     count = await alpha_json_repository.count(domain)
     assert count == 1
+
+
+async def test_json_repository_order_before_pagination(
+        alpha_json_repository):
+    items = await alpha_json_repository.search(
+        [], limit=2, offset=1, order='field_1 DESC')
+
+    assert [item.id for item in items] == ['2', '1']
+
+
+async def test_json_repository_cache(alpha_json_repository, monkeypatch):
+    alpha_json_repository.cache_size = 1
+    path = str(alpha_json_repository.file_path)
+
+    loads_calls = []
+    original_loads = json_repository.json.loads
+
+    def counting_loads(text):
+        loads_calls.append(text)
+        return original_loads(text)
+
+    monkeypatch.setattr(json_repository.json, 'loads', counting_loads)
+
+    assert len(await alpha_json_repository.search([])) == 3
+    assert await alpha_json_repository.count() == 3
+    assert len(loads_calls) == 1
+    assert path in alpha_json_repository.cache
+
+    await alpha_json_repository.add(Alpha(id='4', field_1='value_4'))
+    await alpha_json_repository.remove(Alpha(id='1'))
+
+    items = await alpha_json_repository.search([], order='id')
+    assert [item.id for item in items] == ['2', '3', '4']
+    assert len(loads_calls) == 1
+
+
+async def test_json_repository_cache_external_change(alpha_json_repository):
+    alpha_json_repository.cache_size = 1
+    assert await alpha_json_repository.count() == 3
+
+    with open(alpha_json_repository.file_path, 'w') as f:
+        f.write(dumps({'alphas': {'9': vars(Alpha(id='9'))}}))
+
+    items = await alpha_json_repository.search([])
+    assert [item.id for item in items] == ['9']
+
+
+async def test_json_repository_cache_isolation(alpha_json_repository):
+    alpha_json_repository.cache_size = 1
+    item, *_ = await alpha_json_repository.search([('id', '=', '1')])
+
+    item.field_1 = 'changed'
+    await alpha_json_repository.add(item)
+    item.field_1 = 'unsaved'
+
+    item, *_ = await alpha_json_repository.search([('id', '=', '1')])
+    assert item.field_1 == 'changed'
+
+
+async def test_json_repository_cache_deep_isolation(alpha_json_repository):
+    alpha_json_repository.cache_size = 4
+    for storage in ('document', 'log'):
+        alpha_json_repository.storage = storage
+        item = Alpha(id=storage, field_1=['x'])
+        await alpha_json_repository.add(item)
+        item.field_1.append('added')
+
+        found, *_ = await alpha_json_repository.search([('id', '=', storage)])
+        found.field_1.append('unsaved')
+        streamed = [item async for item in alpha_json_repository.stream(
+            [('id', '=', storage)])]
+        streamed[0].field_1.append('streamed')
+
+        found, *_ = await alpha_json_repository.search([('id', '=', storage)])
+        assert found.field_1 == ['x']
+
+
+async def test_json_repository_cache_size(alpha_json_repository, tmp_path):
+    alpha_json_repository.cache_size = 1
+    await alpha_json_repository.count()
+
+    alpha_json_repository.locator = DefaultLocator('other')
+    await alpha_json_repository.add(Alpha(id='1'))
+
+    assert list(alpha_json_repository.cache) == [
+        str(alpha_json_repository.file_path)]
+
+
+@fixture
+def log_json_repository(alpha_json_repository) -> JsonRepository[Alpha]:
+    alpha_json_repository.storage = 'log'
+    return alpha_json_repository
+
+
+async def test_json_repository_log_add(log_json_repository):
+    await log_json_repository.add(Alpha(id='4', field_1='value_4'))
+    await log_json_repository.add(Alpha(id='1', field_1='updated'))
+
+    with open(log_json_repository.log_path) as f:
+        entries = [loads(line) for line in f]
+    assert [entry['put']['id'] for entry in entries] == ['4', '1']
+
+    with open(log_json_repository.file_path) as f:
+        assert len(loads(f.read())['alphas']) == 3
+
+    items = await log_json_repository.search([], order='id')
+    assert [item.field_1 for item in items] == [
+        'updated', 'value_2', 'value_3', 'value_4']
+    assert await log_json_repository.count() == 4
+
+
+async def test_json_repository_log_remove(log_json_repository):
+    assert await log_json_repository.remove(Alpha(id='2')) is True
+    assert await log_json_repository.remove(Alpha(id='2')) is False
+
+    with open(log_json_repository.log_path) as f:
+        entries = [loads(line) for line in f]
+    assert entries == [{'remove': '2'}]
+
+    items = await log_json_repository.search([], order='id')
+    assert [item.id for item in items] == ['1', '3']
+
+
+async def test_json_repository_log_compact(log_json_repository):
+    await log_json_repository.add(Alpha(id='4', field_1='value_4'))
+    await log_json_repository.remove(Alpha(id='1'))
+
+    await log_json_repository.compact()
+
+    assert log_json_repository.log_path.stat().st_size == 0
+    with open(log_json_repository.file_path) as f:
+        assert sorted(loads(f.read())['alphas']) == ['2', '3', '4']
+
+    items = await log_json_repository.search([], order='id')
+    assert [item.id for item in items] == ['2', '3', '4']
+
+
+async def test_json_repository_log_background_compaction(
+        log_json_repository):
+    log_json_repository.compaction_size = 0
+    log_json_repository.compaction_ratio = 0
+
+    await log_json_repository.add(Alpha(id='4', field_1='value_4'))
+    await log_json_repository._compactions[
+        str(log_json_repository.log_path)]
+
+    assert log_json_repository.log_path.stat().st_size == 0
+    assert await log_json_repository.count() == 4
+
+
+async def test_json_repository_log_compaction_error(
+        log_json_repository, monkeypatch, caplog):
+    def _compact(self):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(JsonRepository, '_compact', _compact)
+    log_json_repository.compaction_size = 0
+    log_json_repository.compaction_ratio = 0
+
+    await log_json_repository.add(Alpha(id='4', field_1='value_4'))
+    compaction = log_json_repository._compactions[
+        str(log_json_repository.log_path)]
+    await asyncio.wait([compaction])
+    await asyncio.sleep(0)
+
+    assert 'Background log compaction failed.' in caplog.text
+    assert await log_json_repository.count() == 4
+
+
+async def test_json_repository_log_cache(log_json_repository):
+    log_json_repository.cache_size = 1
+    assert await log_json_repository.count() == 3
+
+    await log_json_repository.add(Alpha(id='4', field_1='value_4'))
+    identity, data = log_json_repository.cache[
+        str(log_json_repository.log_path)]
+    assert identity[3] == log_json_repository.log_path.stat().st_size
+    assert '4' in data['alphas']
+
+    with open(log_json_repository.log_path, 'a') as f:
+        f.write(dumps({'remove': '1'}) + '\n')
+        f.write('{"put": {"id": "partial"')
+
+    items = await log_json_repository.search([], order='id')
+    assert [item.id for item in items] == ['2', '3', '4']
+
+    await log_json_repository.add(Alpha(id='5', field_1='value_5'))
+    items = await log_json_repository.search([], order='id')
+    assert [item.id for item in items] == ['2', '3', '4', '5']
+
+    await log_json_repository.compact()
+    assert await log_json_repository.count() == 4
+
+
+async def test_json_repository_log_fsync(log_json_repository, monkeypatch):
+    calls = []
+    monkeypatch.setattr(json_repository.os, 'fsync', calls.append)
+    items = [Alpha(id='4'), Alpha(id='5')]
+
+    await log_json_repository.add(items)
+    assert len(calls) == 1
+
+    log_json_repository.fsync = 'write'
+    await log_json_repository.add(items)
+    assert len(calls) == 3
+
+    log_json_repository.fsync = 'none'
+    await log_json_repository.add(items)
+    await log_json_repository.compact()
+    assert len(calls) == 3
+
+
+async def test_json_repository_document_fsync(
+        alpha_json_repository, monkeypatch):
+    calls = []
+    monkeypatch.setattr(json_repository.os, 'fsync', calls.append)
+
+    await alpha_json_repository.add(Alpha(id='4'))
+    assert len(calls) == 0
+
+    alpha_json_repository.fsync = 'write'
+    await alpha_json_repository.add(Alpha(id='5'))
+    assert len(calls) == 1
+
+
+def test_json_repository_locked_open_modes(tmp_path):
+    path = str(tmp_path / 'locked.json')
+    with open(path, 'w') as f:
+        f.write('{}')
+
+    with locked_open(path, 'r'), open(path) as other:
+        fcntl.flock(other, fcntl.LOCK_SH | fcntl.LOCK_NB)
+        with raises(BlockingIOError):
+            fcntl.flock(other, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    with locked_open(path, 'r+'), open(path) as other:
+        with raises(BlockingIOError):
+            fcntl.flock(other, fcntl.LOCK_SH | fcntl.LOCK_NB)
+
+
+async def test_json_repository_atomic_replace(alpha_json_repository):
+    file_path = alpha_json_repository.file_path
+    inode = file_path.stat().st_ino
+
+    with open(file_path) as reader:
+        await alpha_json_repository.add(Alpha(id='4', field_1='value_4'))
+        assert len(loads(reader.read())['alphas']) == 3
+
+    assert file_path.stat().st_ino != inode
+    assert list(file_path.parent.glob('*.tmp')) == []
+    with open(file_path) as f:
+        assert len(loads(f.read())['alphas']) == 4
+
+
+async def test_json_repository_readers_skip_writer_lock(
+        alpha_json_repository):
+    await alpha_json_repository.setup()
+
+    with open(alpha_json_repository.lock_path, 'a') as writer:
+        fcntl.flock(writer, fcntl.LOCK_EX)
+        assert await alpha_json_repository.count() == 3
+
+
+async def test_json_repository_io_off_event_loop(
+        alpha_json_repository, monkeypatch):
+    threads = []
+    load = JsonRepository._load
+
+    def _load(self):
+        threads.append(threading.get_ident())
+        return load(self)
+
+    monkeypatch.setattr(JsonRepository, '_load', _load)
+
+    await alpha_json_repository.add(Alpha(id='4', field_1='value_4'))
+    assert await alpha_json_repository.count() == 4
+
+    assert len(threads) == 2
+    assert threading.get_ident() not in threads
+
+
+async def test_json_repository_concurrent_adds(alpha_json_repository):
+    await asyncio.gather(*[
+        alpha_json_repository.add(Alpha(id=str(index)))
+        for index in range(4, 24)])
+
+    assert await alpha_json_repository.count() == 23
+
+
+async def test_json_repository_log_concurrent_adds(log_json_repository):
+    await asyncio.gather(*[
+        log_json_repository.add(Alpha(id=str(index)))
+        for index in range(4, 24)])
+
+    assert await log_json_repository.count() == 23
+
+
+async def test_json_repository_group_commit(
+        alpha_json_repository, monkeypatch):
+    writes = []
+    write = JsonRepository._write
+
+    def _write(self, data, remember=True):
+        writes.append(len(data['alphas']))
+        return write(self, data, remember)
+
+    monkeypatch.setattr(JsonRepository, '_write', _write)
+
+    results = await asyncio.gather(
+        alpha_json_repository.add(Alpha(id='4')),
+        alpha_json_repository.remove(Alpha(id='1')),
+        alpha_json_repository.add([Alpha(id='5'), Alpha(id='6')]),
+        alpha_json_repository.remove(Alpha(id='4')),
+        alpha_json_repository.remove(Alpha(id='4')))
+
+    assert [item.id for item in results[0]] == ['4']
+    assert results[1:] == [True, [results[2][0], results[2][1]],
+                           True, False]
+    assert writes == [4]
+    items = await alpha_json_repository.search([], order='id')
+    assert [item.id for item in items] == ['2', '3', '5', '6']
+
+
+async def test_json_repository_log_group_commit(log_json_repository):
+    results = await asyncio.gather(
+        log_json_repository.remove(Alpha(id='1')),
+        log_json_repository.add(Alpha(id='4')),
+        log_json_repository.remove([Alpha(id='1'), Alpha(id='4')]),
+        log_json_repository.remove(Alpha(id='9')))
+
+    assert results[0] is True
+    assert results[2:] == [True, False]
+    with open(log_json_repository.log_path) as f:
+        entries = [loads(line) for line in f]
+    assert [next(iter(entry)) for entry in entries] == [
+        'remove', 'put', 'remove']
+    assert await log_json_repository.count() == 2
+
+
+async def test_json_repository_group_commit_error(
+        alpha_json_repository, monkeypatch):
+    def _commit(self, operations):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(JsonRepository, '_commit', _commit)
+
+    results = await asyncio.gather(
+        alpha_json_repository.add(Alpha(id='4')),
+        alpha_json_repository.remove(Alpha(id='1')),
+        return_exceptions=True)
+
+    assert [str(result) for result in results] == ['disk full'] * 2
+    assert alpha_json_repository._pending == {}
+
+
+@fixture
+def sharded_json_repository(tmp_path) -> JsonRepository[Alpha]:
+    return JsonRepository(
+        data_path=str(tmp_path), collection='alphas', constructor=Alpha,
+        locator=DefaultLocator('origin'), shards=4)
+
+
+async def test_json_repository_sharded_add(sharded_json_repository):
+    items = [Alpha(id=str(index), field_1=f'value_{index:02}')
+             for index in range(20)]
+    assert await sharded_json_repository.add(items) == items
+
+    directory = sharded_json_repository.file_path.parent
+    shards = sorted(path.name for path in directory.glob('alphas.*.json'))
+    assert shards == [f'alphas.{index}.json' for index in range(4)]
+
+    records = {}
+    for path in directory.glob('alphas.*.json'):
+        shard_records = loads(path.read_text())['alphas']
+        assert len(shard_records) < 20
+        records.update(shard_records)
+    assert sorted(records, key=int) == [str(index) for index in range(20)]
+
+    await sharded_json_repository.add(Alpha(id='3', field_1='updated'))
+    assert await sharded_json_repository.count() == 20
+    assert await sharded_json_repository.count(
+        [('field_1', '=', 'updated')]) == 1
+
+
+async def test_json_repository_sharded_remove(sharded_json_repository):
+    await sharded_json_repository.add(
+        [Alpha(id=str(index)) for index in range(10)])
+
+    assert await sharded_json_repository.remove(
+        [Alpha(id='2'), Alpha(id='7'), Alpha(id='99')]) is True
+    assert await sharded_json_repository.remove(Alpha(id='2')) is False
+    assert await sharded_json_repository.count() == 8
+
+
+async def test_json_repository_sharded_search(sharded_json_repository):
+    await sharded_json_repository.add(
+        [Alpha(id=str(index), field_1=f'value_{index:02}')
+         for index in range(20)])
+
+    items = await sharded_json_repository.search(
+        [('field_1', '>=', 'value_05')], limit=4, offset=2,
+        order='field_1 desc')
+    assert [item.id for item in items] == ['17', '16', '15', '14']
+
+    items = await sharded_json_repository.search([])
+    assert len(items) == 20
+    assert len(await sharded_json_repository.search([], limit=3)) == 3
+
+
+async def test_json_repository_sharded_log(sharded_json_repository):
+    sharded_json_repository.storage = 'log'
+    await sharded_json_repository.setup()
+    await sharded_json_repository.add(
+        [Alpha(id=str(index)) for index in range(10)])
+    await sharded_json_repository.remove(Alpha(id='4'))
+
+    directory = sharded_json_repository.file_path.parent
+    assert len(list(directory.glob('alphas.*.log'))) == 4
+    assert await sharded_json_repository.count() == 9
+
+    await sharded_json_repository.compact()
+    assert all(path.stat().st_size == 0
+               for path in directory.glob('alphas.*.log'))
+    assert await sharded_json_repository.count() == 9
+
+
+@fixture
+def indexed_json_repository(alpha_json_repository) -> JsonRepository[Alpha]:
+    alpha_json_repository.indexes = ['field_1', 'alpha_id']
+    return alpha_json_repository
+
+
+async def test_json_repository_index_file(indexed_json_repository):
+    await indexed_json_repository.add([
+        Alpha(id='4', field_1='value_1'), Alpha(id='5', field_1=5)])
+
+    with open(indexed_json_repository.file_path) as f:
+        content = f.read()
+        assert len(loads(content)['alphas']) == 5
+
+    with open(indexed_json_repository.index_path) as f:
+        index = loads(f.read())
+
+    stat = indexed_json_repository.file_path.stat()
+    assert index['identity'] == [
+        stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns]
+    start, end = index['offsets']['4']
+    assert loads(content[start:end])['field_1'] == 'value_1'
+    assert index['fields']['field_1']['values'] == {
+        'value_1': ['1', '4'], 'value_2': ['2'], 'value_3': ['3']}
+    assert index['fields']['alpha_id']['missing'] == ['1', '2', '3', '4', '5']
+
+
+async def test_json_repository_index_lookup(
+        indexed_json_repository, monkeypatch):
+    await indexed_json_repository.add([
+        Alpha(id='4', field_1='value_1'), Alpha(id='5', field_1=5)])
+
+    decoded = []
+    loads_ = json_repository.json.loads
+
+    def counting_loads(content):
+        decoded.append(content)
+        return loads_(content)
+
+    monkeypatch.setattr(json_repository.json, 'loads', counting_loads)
+    monkeypatch.setattr(JsonRepository, '_load', None)
+
+    items = await indexed_json_repository.search(
+        [('field_1', '=', 'value_1')])
+    assert [item.id for item in items] == ['1', '4']
+    assert await indexed_json_repository.count(
+        [('field_1', 'in', ['value_2', 'value_3']), ('id', '!=', '2')]) == 1
+    items = await indexed_json_repository.find(['5', '3', '7'])
+    assert [item and item.id for item in items] == ['5', '3', None]
+
+    assert decoded and not any(
+        'alphas' in str(content) for content in decoded)
+
+
+async def test_json_repository_index_fallback(indexed_json_repository):
+    await indexed_json_repository.add(Alpha(id='4', field_1=4))
+
+    assert await indexed_json_repository.count(
+        [('field_1', '=', 4)]) == 1
+    assert await indexed_json_repository.count(
+        ['|', ('id', '=', '9'), ('field_1', '=', 'value_1')]) == 1
+
+    with open(indexed_json_repository.file_path, 'w') as f:
+        f.write(dumps({'alphas': {'6': vars(Alpha(id='6'))}}))
+
+    assert await indexed_json_repository.count([('id', '=', '6')]) == 1
+
+
+async def test_json_repository_stream(alpha_json_repository, monkeypatch):
+    await alpha_json_repository.add(
+        [Alpha(id=str(index), field_1=f'value_{index % 3}')
+         for index in range(4, 40)])
+    monkeypatch.setattr(JsonRepository, '_load', None)
+
+    items = [item async for item in alpha_json_repository.stream(
+        [('field_1', '=', 'value_1')], batch_size=5)]
+
+    assert [item.id for item in items] == ['1'] + [
+        str(index) for index in range(4, 40) if index % 3 == 1]
+
+
+async def test_json_repository_stream_early_exit(alpha_json_repository):
+    async for item in alpha_json_repository.stream([], batch_size=1):
+        assert item.id == '1'
+        break
+
+    alpha_json_repository.data_path = '/tmp/.non_existent_stream'
+    assert [item async for item in alpha_json_repository.stream([])] == []
+
+
+async def test_json_repository_stream_log_and_shards(
+        log_json_repository, sharded_json_repository):
+    await log_json_repository.add(Alpha(id='4', field_1='value_4'))
+    await log_json_repository.remove(Alpha(id='2'))
+    items = [item async for item in log_json_repository.stream([])]
+    assert sorted(item.id for item in items) == ['1', '3', '4']
+
+    await sharded_json_repository.add(
+        [Alpha(id=str(index)) for index in range(10)])
+    items = [item async for item in sharded_json_repository.stream(
+        [('id', '!=', '3')])]
+    assert sorted(item.id for item in items) == [
+        '0', '1', '2', '4', '5', '6', '7', '8', '9']
+
+
+@mark.parametrize('format', ['compact', 'gzip', 'lzma', 'pickle', 'marshal'])
+async def test_json_repository_formats(alpha_json_repository, format):
+    alpha_json_repository.format = format
+    await alpha_json_repository.add(Alpha(id='4', field_1='value_4'))
+
+    with open(alpha_json_repository.file_path, 'rb') as f:
+        content = f.read()
+    assert json_repository.detect(content) == (
+        'json' if format == 'compact' else format)
+
+    assert await alpha_json_repository.count() == 4
+    items = [item async for item in alpha_json_repository.stream(
+        [('field_1', '=', 'value_4')])]
+    assert [item.id for item in items] == ['4']
+
+    alpha_json_repository.format = 'json'
+    if format in ('pickle', 'marshal'):
+        with raises(ValueError):
+            await alpha_json_repository.count()
+        return
+
+    await alpha_json_repository.remove(Alpha(id='1'))
+    assert loads(alpha_json_repository.file_path.read_text())[
+        'alphas'].keys() == {'2', '3', '4'}
+
+
+async def test_json_repository_format_with_indexes(indexed_json_repository):
+    indexed_json_repository.format = 'gzip'
+    await indexed_json_repository.add(Alpha(id='4', field_1='value_4'))
+
+    assert not indexed_json_repository.index_path.exists()
+    assert await indexed_json_repository.count(
+        [('field_1', '=', 'value_4')]) == 1
@@ -0,0 +1,56 @@
+from json import dumps, JSONDecodeError
+from pytest import raises
+from modelark.repository.json_stream import stream_records, Tokenizer
+
+
+def write(tmp_path, content: str):
+    path = tmp_path / 'collection.json'
+    path.write_text(content, encoding='utf-8')
+    return open(path, 'rb')
+
+
+def test_stream_records(tmp_path):
+    document = {
+        'others': {'9': {'id': '9', 'values': [1, {'nested': '}'}]}},
+        'alphas': {
+            '1': {'id': '1', 'name': 'ñandú', 'amount': 12345},
+            '2': {'id': '2', 'name': 'x' * 50, 'active': True},
+            '3': {'id': '3', 'amount': 1.5e10, 'tags': None}
+        }
+    }
+    for indent in (None, 2):
+        with write(tmp_path, dumps(document, indent=indent,
+                                   ensure_ascii=False)) as f:
+            for chunk_size in (1, 7, 1 << 20):
+                records = list(stream_records(f, 'alphas', chunk_size))
+                assert records == list(document['alphas'].items())
+
+
+def test_stream_records_empty(tmp_path):
+    with write(tmp_path, '') as f:
+        assert list(stream_records(f, 'alphas')) == []
+    with write(tmp_path, ' {} ') as f:
+        assert list(stream_records(f, 'alphas')) == []
+    with write(tmp_path, '{"alphas": {}}') as f:
+        assert list(stream_records(f, 'alphas')) == []
+
+
+def test_stream_records_invalid(tmp_path):
+    with write(tmp_path, '{"alphas": {"1": {"id": "1"}, "2": {"id"') as f:
+        records = stream_records(f, 'alphas', 4)
+        assert next(records) == ('1', {'id': '1'})
+        with raises(JSONDecodeError):
+            next(records)
+
+    with write(tmp_path, '["alphas"]') as f:
+        with raises(JSONDecodeError):
+            list(stream_records(f, 'alphas'))
+
+
+def test_tokenizer_numbers_across_chunks():
+    tokenizer = Tokenizer(b'[123456, 7]', 3)
+    tokenizer.expect('[')
+    assert tokenizer.value() == 123456
+    assert tokenizer.separator(']') is False
+    assert tokenizer.value() == 7
+    assert tokenizer.separator(']') is True
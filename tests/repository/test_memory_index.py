@@ -0,0 +1,112 @@
+from pytest import raises
+from modelark.common import Entity
+from modelark.repository import HashIndex, OrderedIndex
+
+
+def test_hash_index_add_and_lookup():
+    index = HashIndex('status')
+
+    index.add('1', Entity(id='1', status='active'))
+    index.add('2', Entity(id='2', status='inactive'))
+    index.add('3', Entity(id='3', status='active'))
+
+    assert list(index.lookup(['active'])) == ['1', '3']
+    assert list(index.lookup(['active', 'inactive'])) == ['1', '3', '2']
+    assert list(index.lookup(['missing'])) == []
+
+
+def test_hash_index_update_and_remove():
+    index = HashIndex('status')
+    entity = Entity(id='1', status='active')
+    index.add('1', entity)
+
+    entity.status = 'inactive'
+    index.add('1', entity)
+
+    assert list(index.lookup(['active'])) == []
+    assert list(index.lookup(['inactive'])) == ['1']
+
+    index.remove('1')
+    index.remove('1')
+
+    assert index.buckets == {}
+    assert index.keys == {}
+
+
+def test_hash_index_unhashable_values():
+    index = HashIndex('status')
+    index.add('1', Entity(id='1', status=['active']))
+    index.add('2', Entity(id='2'))
+
+    assert list(index.lookup(['active'])) == ['1']
+
+    index.remove('1')
+    assert list(index.lookup(['active'])) == []
+
+    with raises(TypeError):
+        index.lookup([['active']])
+
+
+def test_hash_index_missing_field():
+    index = HashIndex('missing')
+    index.add('1', Entity(id='1'))
+
+    assert list(index.lookup([None])) == []
+
+
+def test_ordered_index_add_and_remove():
+    index = OrderedIndex('created_at')
+    for id, created_at in [('1', 30), ('2', 10), ('3', 20), ('4', 10)]:
+        index.add(id, Entity(id=id, created_at=created_at))
+
+    assert index.values == [10, 10, 20, 30]
+    assert index.ids == ['2', '4', '3', '1']
+
+    index.add('2', Entity(id='2', created_at=40))
+    index.remove('3')
+    index.remove('3')
+
+    assert index.values == [10, 30, 40]
+    assert index.ids == ['4', '1', '2']
+
+
+def test_ordered_index_span_and_lookup():
+    index = OrderedIndex('created_at')
+    for id, created_at in [('1', 10), ('2', 20), ('3', 20), ('4', 30)]:
+        index.add(id, Entity(id=id, created_at=created_at))
+
+    assert index.span([]) == (0, 4)
+    assert index.span([('>', 10)]) == (1, 4)
+    assert index.span([('>=', 20), ('<', 30)]) == (1, 3)
+    assert index.span([('<=', 20)]) == (0, 3)
+    assert index.span([('=', 20)]) == (1, 3)
+    assert index.span([('>', 30)]) == (4, 4)
+    assert index.span([('>', 20), ('<', 10)]) == (3, 3)
+
+    assert list(index.lookup([('>=', 20)])) == ['2', '3', '4']
+
+    with raises(TypeError):
+        index.lookup([('>', 'text')])
+
+
+def test_ordered_index_scan():
+    index = OrderedIndex('created_at')
+    for id, created_at in [('1', 10), ('2', 20), ('3', 20), ('4', 30)]:
+        index.add(id, Entity(id=id, created_at=created_at))
+
+    assert list(index.scan(0, 4)) == [['1'], ['2', '3'], ['4']]
+    assert list(index.scan(0, 4, True)) == [['4'], ['2', '3'], ['1']]
+    assert list(index.scan(1, 3, True)) == [['2', '3']]
+    assert list(index.scan(2, 2)) == []
+
+
+def test_ordered_index_unordered_values():
+    index = OrderedIndex('created_at')
+    index.add('1', Entity(id='1', created_at=10))
+    index.add('2', Entity(id='2', created_at='text'))
+
+    assert index.unordered == {'2': None}
+    assert list(index.lookup([('>', 5)])) == ['2', '1']
+
+    index.remove('2')
+    assert index.unordered == {}
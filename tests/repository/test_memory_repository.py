@@ -1,7 +1,7 @@
 from asyncio import sleep
 from typing import Callable
 from pytest import fixture, mark, raises
-from modelark.common import Entity
+from modelark.common import Entity, DefaultLocator
 from modelark.filterer import Domain
 from modelark.repository import Repository, MemoryRepository
 
@@ -311,3 +311,171 @@ async def test_memory_repository_count_domain(alpha_memory_repository):
     count = await alpha_memory_repository.count(domain)
 
     assert count == 1
+
+
+@fixture
+def indexed_memory_repository() -> MemoryRepository[Beta]:
+    class BetaMemoryRepository(MemoryRepository[Beta]):
+        model = Beta
+
+    return BetaMemoryRepository(indexes=['alpha_id', 'status']).load({
+        "default": {
+            "1": Beta(id='1', alpha_id='1', status='active'),
+            "2": Beta(id='2', alpha_id='1', status='inactive'),
+            "3": Beta(id='3', alpha_id='2', status='active')
+        }
+    })
+
+
+async def test_memory_repository_indexed_search(indexed_memory_repository):
+    repository = indexed_memory_repository
+
+    items = await repository.search([('alpha_id', '=', '1')])
+    assert [item.id for item in items] == ['1', '2']
+
+    items = await repository.search(
+        [('alpha_id', 'in', ['1', '2']), ('status', '=', 'active')])
+    assert [item.id for item in items] == ['1', '3']
+
+    items = await repository.search(
+        [('alpha_id', '=', '1'), ('id', '!=', '1')])
+    assert [item.id for item in items] == ['2']
+
+    items = await repository.search(
+        ['|', ('alpha_id', '=', '1'), ('status', '=', 'active')])
+    assert [item.id for item in items] == ['1', '2', '3']
+
+    assert await repository.count([('status', '=', 'active')]) == 2
+    assert await repository.count([('alpha_id', 'in', '1')]) == 0
+
+
+async def test_memory_repository_indexed_add_remove(
+        indexed_memory_repository):
+    repository = indexed_memory_repository
+
+    item = repository.data['default']['1']
+    item.status = 'inactive'
+    await repository.add([item, Beta(id='4', alpha_id='2', status='active')])
+
+    items = await repository.search([('status', '=', 'active')])
+    assert [item.id for item in items] == ['3', '4']
+
+    await repository.remove(items[0])
+
+    items = await repository.search([('status', '=', 'active')])
+    assert [item.id for item in items] == ['4']
+    assert await repository.count([('status', '=', 'inactive')]) == 2
+
+
+async def test_memory_repository_indexed_find(indexed_memory_repository):
+    repository = indexed_memory_repository
+
+    items = await repository.find(['2', '3', '5'], 'alpha_id')
+
+    assert [item and item.id for item in items] == ['3', None, None]
+
+
+async def test_memory_repository_indexed_locations(
+        indexed_memory_repository):
+    repository = indexed_memory_repository
+    repository.locator = DefaultLocator('other')
+
+    await repository.add(Beta(id='9', alpha_id='1', status='active'))
+
+    items = await repository.search([('alpha_id', '=', '1')])
+    assert [item.id for item in items] == ['9']
+
+
+@fixture
+def ordered_memory_repository() -> MemoryRepository[Beta]:
+    class BetaMemoryRepository(MemoryRepository[Beta]):
+        model = Beta
+
+    return BetaMemoryRepository(
+        indexes=['alpha_id'], ordered_indexes=['created_at']).load({
+            "default": {
+                str(index): Beta(id=str(index), alpha_id=str(index % 2),
+                                 created_at=(index * 7) % 10)
+                for index in range(10)
+            }
+        })
+
+
+async def test_memory_repository_ordered_range(ordered_memory_repository):
+    repository = ordered_memory_repository
+
+    items = await repository.search(
+        [('created_at', '>=', 3), ('created_at', '<', 6)])
+    assert sorted(item.created_at for item in items) == [3, 4, 5]
+
+    assert await repository.count([('created_at', '>', 7)]) == 2
+    assert await repository.count(
+        [('created_at', '>', 7), ('alpha_id', '=', '1')]) == 1
+
+
+async def test_memory_repository_ordered_order_limit(
+        ordered_memory_repository):
+    repository = ordered_memory_repository
+
+    items = await repository.search([], limit=3, order='created_at')
+    assert [item.created_at for item in items] == [0, 1, 2]
+
+    items = await repository.search(
+        [('created_at', '<=', 8)], limit=2, offset=1,
+        order='created_at DESC')
+    assert [item.created_at for item in items] == [7, 6]
+
+    items = await repository.search(
+        [('alpha_id', '=', '1')], order='created_at desc')
+    assert [item.created_at for item in items] == [9, 7, 5, 3, 1]
+
+
+async def test_memory_repository_ordered_multiple_fields(
+        ordered_memory_repository):
+    repository = ordered_memory_repository
+    await repository.add(Beta(id='10', alpha_id='1', created_at=5))
+
+    items = await repository.search(
+        [('created_at', '=', 5)], order='created_at, id desc')
+
+    assert [item.id for item in items] == ['5', '10']
+
+
+async def test_memory_repository_ordered_unordered_values(
+        ordered_memory_repository):
+    repository = ordered_memory_repository
+    await repository.add(Beta(id='10', alpha_id='1', created_at='text'))
+
+    items = await repository.search([('id', '=', '10')], order='created_at')
+    assert [item.id for item in items] == ['10']
+
+    await repository.remove(items)
+
+    items = await repository.search([], limit=2, order='created_at')
+    assert [item.created_at for item in items] == [0, 1]
+
+
+async def test_memory_repository_indexed_storage_order(
+        ordered_memory_repository):
+    repository = ordered_memory_repository
+    await repository.add(Beta(id='1', alpha_id='1', created_at=4))
+
+    items = await repository.search([('created_at', '>', 2)])
+    assert [item.id for item in items] == ['1', '2', '4', '5', '7', '8', '9']
+
+    items = await repository.search(
+        [('created_at', '>', 2)], limit=6, order='created_at desc')
+    assert [item.id for item in items] == ['7', '4', '8', '5', '1', '2']
+
+
+async def test_memory_repository_order_before_pagination(
+        alpha_memory_repository):
+    items = await alpha_memory_repository.search(
+        [], limit=1, offset=1, order='field_1 DESC')
+
+    assert [item.id for item in items] == ['2']
+
+    items = await alpha_memory_repository.search(
+        [], limit=2, order='field_1 DESC')
+
+    assert [item.id for item in items] == ['3', '2']
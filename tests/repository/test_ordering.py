@@ -0,0 +1,66 @@
+from random import Random
+from modelark.common import Entity
+from modelark.repository import parse_order, sort_items, select_items, arrange
+
+
+class Alpha(Entity):
+    def __init__(self, **attributes) -> None:
+        super().__init__(**attributes)
+        self.field_1 = attributes.get('field_1', 0)
+        self.field_2 = attributes.get('field_2', '')
+
+
+def test_parse_order():
+    assert parse_order('field_1') == [('field_1', False)]
+    assert parse_order('Field_1 DESC, field_2 asc') == [
+        ('field_1', True), ('field_2', False)]
+
+
+def test_sort_items():
+    items = [Alpha(id='1', field_1=2, field_2='a'),
+             Alpha(id='2', field_1=1, field_2='b'),
+             Alpha(id='3', field_1=2, field_2='b')]
+
+    result = sort_items(items, [('field_1', True), ('field_2', True)])
+    assert [item.id for item in result] == ['3', '1', '2']
+
+    result = sort_items(items, [('field_1', True), ('field_2', False)])
+    assert [item.id for item in result] == ['1', '3', '2']
+
+
+def test_select_items():
+    items = [Alpha(id=str(index), field_1=index % 3, field_2=str(index))
+             for index in range(9)]
+
+    result = select_items(items, [('field_1', False)], 4)
+    assert [item.id for item in result] == ['0', '3', '6', '1']
+
+    result = select_items(items, [('field_1', True), ('field_2', False)], 4)
+    assert [item.id for item in result] == ['2', '5', '8', '1']
+
+    assert select_items(items, [('field_1', True), ('id', False)], 0) == []
+
+
+def test_arrange_orders_before_pagination():
+    items = [Alpha(id=str(index), field_1=index) for index in range(5)]
+
+    result = arrange(items, 'field_1 desc', limit=2, offset=1)
+
+    assert [item.id for item in result] == ['3', '2']
+    assert [item.id for item in arrange(items, limit=2, offset=1)] == [
+        '1', '2']
+    assert arrange(items, 'field_1', limit=0) == []
+
+
+def test_arrange_top_k_matches_full_sort():
+    random = Random(7)
+    items = [Alpha(id=str(index), field_1=random.randint(0, 20),
+                   field_2=random.choice('abc')) for index in range(500)]
+
+    for order in ['field_1', 'field_1 desc', 'field_1 desc, field_2',
+                  'field_2, field_1 desc', 'field_2 desc, field_1 desc']:
+        expected = arrange(items, order)
+        for limit, offset in [(5, None), (10, 7), (40, 20), (300, 100)]:
+            result = arrange(items, order, limit, offset)
+            start = offset or 0
+            assert result == expected[start:start + limit]
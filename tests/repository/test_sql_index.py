@@ -0,0 +1,75 @@
+from pytest import raises
+from modelark.filterer import SqlParser
+from modelark.repository import SqlIndex
+
+
+def test_sql_index_definition():
+    index = SqlIndex('amount', 'integer')
+
+    assert index.definition('alphas', 'tenant.alphas', 'data') == (
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS alphas_amount_integer_index "
+        "ON tenant.alphas USING btree (((data->>'amount')::integer))")
+
+
+def test_sql_index_unique_partial_hash():
+    unique = SqlIndex('code', unique=True, where="data->>'status' = 'on'",
+                      name='alphas_code_key')
+    hashed = SqlIndex('reference', method='hash')
+
+    assert unique.definition('alphas', 'alphas', 'data') == (
+        "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS alphas_code_key "
+        "ON alphas USING btree (((data->>'code')::text)) "
+        "WHERE data->>'status' = 'on'")
+    assert hashed.definition('alphas', 'alphas', 'data') == (
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS alphas_reference_text_index "
+        "ON alphas USING hash (((data->>'reference')::text))")
+
+
+def test_sql_index_matches_parser_expressions():
+    parser = SqlParser(jsonb_collection='data')
+    cases = [(SqlIndex('field'), 'value'), (SqlIndex('field', 'integer'), 7),
+             (SqlIndex('field', 'float'), 7.5),
+             (SqlIndex('field', 'boolean'), True)]
+
+    for index, value in cases:
+        condition, _ = parser.parse([(index.field, '=', value)])
+        assert condition == f'{index.expression("data")} = $1'
+
+
+def test_sql_index_validation():
+    assert SqlIndex.of('field').cast == 'text'
+    with raises(ValueError):
+        SqlIndex('field', 'jsonb')
+    with raises(ValueError):
+        SqlIndex('field', method='gist')
+    with raises(ValueError):
+        SqlIndex('field', unique=True, method='hash')
+
+
+def test_sql_index_document_gin():
+    index = SqlIndex('', method='gin', operators='jsonb_path_ops')
+
+    assert index.definition('alphas', 'tenant.alphas', 'data') == (
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS alphas_document_gin_index "
+        "ON tenant.alphas USING gin (data jsonb_path_ops)")
+    with raises(ValueError):
+        SqlIndex('field', method='gin')
+    with raises(ValueError):
+        SqlIndex('', method='btree')
+    with raises(ValueError):
+        SqlIndex('', method='gin', operators='gin_trgm_ops')
+    with raises(ValueError):
+        SqlIndex('status', operators='jsonb_path_ops')
+
+
+def test_sql_index_order():
+    index = SqlIndex('created_at', 'integer', order='desc nulls last')
+
+    assert index.definition('alphas', 'alphas', 'data') == (
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS "
+        "alphas_created_at_integer_index ON alphas USING btree "
+        "(((data->>'created_at')::integer) DESC NULLS LAST)")
+    with raises(ValueError):
+        SqlIndex('field', order='sideways')
+    with raises(ValueError):
+        SqlIndex('field', method='hash', order='DESC')
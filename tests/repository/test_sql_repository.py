@@ -3,10 +3,10 @@ from asyncio import sleep
 from inspect import cleandoc
 from typing import Callable, List, Tuple, Dict, Mapping, Any
 from pytest import fixture, mark, raises
-from modelark.common import Entity
+from modelark.common import Entity, DefaultLocator
 from modelark.filterer import Domain
 from modelark.connector import Connector, Connection
-from modelark.repository import Repository, SqlRepository
+from modelark.repository import Repository, SqlRepository, SqlIndex
 
 
 pytestmark = mark.asyncio
@@ -188,10 +188,10 @@ async def test_sql_repository_search_limit(alpha_sql_repository):
         WHERE 1 = 1
 
         ORDER BY data->>'created_at' DESC NULLS LAST
-        LIMIT 2
+        LIMIT $1
         """)
     args = connection.fetch_args
-    assert args == ()
+    assert args == (2,)
 
 
 async def test_sql_repository_search_limit_none(alpha_sql_repository):
@@ -224,8 +224,9 @@ async def test_sql_repository_search_offset(alpha_sql_repository):
 
         ORDER BY data->>'created_at' DESC NULLS LAST
 
-        OFFSET 2
+        OFFSET $1
         """)
+    assert connection.fetch_args == (2,)
 
 
 async def test_sql_repository_search_order(alpha_sql_repository):
@@ -246,6 +247,221 @@ async def test_sql_repository_search_order(alpha_sql_repository):
     assert args == ()
 
 
+async def test_sql_repository_search_typed_order(alpha_sql_repository):
+    alpha_sql_repository.indexes = [
+        SqlIndex('created_at', 'integer', order='desc nulls last'),
+        SqlIndex('amount', 'float')]
+    connection = alpha_sql_repository.connector.connection
+
+    await alpha_sql_repository.search([], limit=5)
+    default_query = connection.fetch_query
+    alpha_sql_repository.connector.pool.append(connection)
+    await alpha_sql_repository.search([], order='amount DESC, id ASC')
+
+    assert "ORDER BY (data->>'created_at')::integer DESC NULLS LAST" in (
+        default_query)
+    assert ("ORDER BY (data->>'amount')::float DESC, data->>'id' ASC" in
+            connection.fetch_query)
+
+
+async def test_sql_repository_search_index_casts(mock_connector):
+    repository = SqlRepository('alphas', Alpha, mock_connector, indexes=[
+        SqlIndex('amount', 'float'), SqlIndex.of('created_at')])
+    connection = mock_connector.connection
+
+    await repository.search(
+        [('amount', '>', 5), ('created_at', 'in', [1, 2])],
+        order='amount desc')
+
+    assert ("WHERE (data->>'amount')::float > $1 AND "
+            "(data->>'created_at')::text = ANY($2)" in connection.fetch_query)
+    assert "ORDER BY (data->>'amount')::float desc" in connection.fetch_query
+    assert connection.fetch_args == (5, ['1', '2'])
+
+
+async def test_sql_repository_stream(alpha_sql_repository):
+    connection = alpha_sql_repository.connector.connection
+    rows = [{'data': json.dumps({'id': str(i)})} for i in range(5)]
+    events: List[Any] = []
+
+    class MockCursor:
+        async def fetch(self, n: int) -> List[Any]:
+            events.append(n)
+            chunk = rows[:n]
+            del rows[:n]
+            return chunk
+
+    class MockTransaction:
+        async def __aenter__(self) -> None:
+            events.append('begin')
+
+        async def __aexit__(self, *args) -> None:
+            events.append('end')
+
+    async def cursor(query: str, *args) -> MockCursor:
+        connection.fetch_query = query
+        connection.fetch_args = args
+        return MockCursor()
+
+    connection.cursor = cursor
+    connection.transaction = MockTransaction
+
+    items = []
+    async for item in alpha_sql_repository.stream(
+            [('field_1', '=', 'value_1')], batch_size=2):
+        items.append(item)
+        events.append(item.id)
+
+    assert [item.id for item in items] == ['0', '1', '2', '3', '4']
+    assert events == [
+        'begin', 2, '0', '1', 2, '2', '3', 2, '4', 'end']
+    assert "WHERE (data->>'field_1')::text = $1" in connection.fetch_query
+    assert 'ORDER BY' not in connection.fetch_query
+    assert connection.fetch_args == ('value_1',)
+
+    events.clear()
+    rows.extend({'data': json.dumps({'id': str(i)})} for i in range(5))
+    alpha_sql_repository.connector.pool.append(connection)
+    stream = alpha_sql_repository.stream([], batch_size=2)
+    assert (await stream.__anext__()).id == '0'
+    await stream.aclose()
+
+    assert events == ['begin', 2, 'end']
+
+
+async def test_sql_repository_stream_without_cursor(alpha_sql_repository):
+    connection = alpha_sql_repository.connector.connection
+    connection.fetch_result = [{'data': json.dumps({'id': '1'})}]
+
+    items = [item async for item in alpha_sql_repository.stream([])]
+
+    assert [item.id for item in items] == ['1']
+    assert 'ORDER BY' not in connection.fetch_query
+
+    alpha_sql_repository.connector.pool.append(connection)
+    async for _ in alpha_sql_repository.stream([], order='field_1 desc'):
+        pass
+
+    assert "ORDER BY data->>'field_1' desc" in connection.fetch_query
+
+
+async def test_sql_repository_paginate(alpha_sql_repository):
+    alpha_sql_repository.indexes = [SqlIndex('created_at', 'integer')]
+    connection = alpha_sql_repository.connector.connection
+    connection.fetch_result = [
+        {'data': json.dumps({'id': str(i), 'created_at': 10 - i})}
+        for i in range(3)]
+
+    items, cursor = await alpha_sql_repository.paginate(
+        [('field_1', '=', 'value_1')], 2)
+
+    assert [item.id for item in items] == ['0', '1']
+    assert cleandoc(connection.fetch_query) == cleandoc("""
+        SELECT data
+        FROM public.alphas
+        WHERE ((data->>'field_1')::text = $1)
+        ORDER BY (data->>'created_at')::integer DESC NULLS LAST, \
+data->>'id' DESC
+        LIMIT $2
+    """)
+    assert connection.fetch_args == ('value_1', 3)
+
+    connection.fetch_result = connection.fetch_result[2:]
+    alpha_sql_repository.connector.pool.append(connection)
+    items, cursor = await alpha_sql_repository.paginate(
+        [('field_1', '=', 'value_1')], 2, cursor=cursor)
+
+    assert [item.id for item in items] == ['2']
+    assert cursor == ''
+    assert ("WHERE ((data->>'field_1')::text = $1) AND "
+            "(((data->>'created_at')::integer < $2 OR "
+            "(data->>'created_at')::integer IS NULL) OR "
+            "((data->>'created_at')::integer = $2 AND data->>'id' < $3))" in
+            connection.fetch_query)
+    assert "LIMIT $4" in connection.fetch_query
+    assert connection.fetch_args == ('value_1', 9, '1', 3)
+
+
+async def test_sql_repository_paginate_text_index(alpha_sql_repository):
+    alpha_sql_repository.indexes = [SqlIndex.of('created_at')]
+    connection = alpha_sql_repository.connector.connection
+    connection.fetch_result = [
+        {'data': json.dumps({'id': str(i), 'created_at': 100 + i})}
+        for i in range(3)]
+
+    _, cursor = await alpha_sql_repository.paginate([], 1)
+    alpha_sql_repository.connector.pool.append(connection)
+    await alpha_sql_repository.paginate([], 1, cursor=cursor)
+
+    assert ("((data->>'created_at')::text < $1 OR "
+            "(data->>'created_at')::text IS NULL) OR "
+            "((data->>'created_at')::text = $1 AND data->>'id' < $2)" in
+            connection.fetch_query)
+    assert connection.fetch_args == ('100', '0', 2)
+
+
+async def test_sql_repository_paginate_mixed_order(alpha_sql_repository):
+    connection = alpha_sql_repository.connector.connection
+    connection.fetch_result = [
+        {'data': json.dumps({'id': str(i), 'field_1': i})} for i in range(2)]
+
+    items, cursor = await alpha_sql_repository.paginate(
+        [], 1, order='field_1 ASC, id DESC')
+    alpha_sql_repository.connector.pool.append(connection)
+    await alpha_sql_repository.paginate(
+        [], 1, order='field_1 ASC, id DESC', cursor=cursor)
+
+    assert ("WHERE (1 = 1) AND ((data->>'field_1' > $1 OR "
+            "data->>'field_1' IS NULL) OR "
+            "(data->>'field_1' = $1 AND data->>'id' < $2))" in
+            connection.fetch_query)
+    assert "ORDER BY data->>'field_1' ASC, data->>'id' DESC" in (
+        connection.fetch_query)
+    assert connection.fetch_args == ('0', '0', 2)
+
+    with raises(ValueError):
+        await alpha_sql_repository.paginate([], 1, cursor=cursor)
+    with raises(ValueError):
+        await alpha_sql_repository.paginate([], 1, cursor='invalid')
+
+
+async def test_sql_repository_paginate_nulls(alpha_sql_repository):
+    connection = alpha_sql_repository.connector.connection
+    connection.fetch_result = [
+        {'data': json.dumps({'id': str(i), 'created_at': None})}
+        for i in range(2)]
+
+    _, cursor = await alpha_sql_repository.paginate([], 1)
+    alpha_sql_repository.connector.pool.append(connection)
+    await alpha_sql_repository.paginate([], 1, cursor=cursor)
+
+    assert ("WHERE (1 = 1) AND (data->>'created_at' IS NULL AND "
+            "data->>'id' < $1)" in connection.fetch_query)
+    assert connection.fetch_args == ('0', 2)
+
+    order = 'field_1 DESC NULLS FIRST, id DESC'
+    alpha_sql_repository.connector.pool.append(connection)
+    _, cursor = await alpha_sql_repository.paginate([], 1, order=order)
+    alpha_sql_repository.connector.pool.append(connection)
+    await alpha_sql_repository.paginate([], 1, order=order, cursor=cursor)
+
+    assert ("WHERE (1 = 1) AND (data->>'field_1' IS NOT NULL OR "
+            "(data->>'field_1' IS NULL AND data->>'id' < $1))" in
+            connection.fetch_query)
+
+    connection.fetch_result = [
+        {'data': json.dumps({'id': str(i), 'field_1': 'a'})}
+        for i in range(2)]
+    alpha_sql_repository.connector.pool.append(connection)
+    _, cursor = await alpha_sql_repository.paginate([], 1, order=order)
+    alpha_sql_repository.connector.pool.append(connection)
+    await alpha_sql_repository.paginate([], 1, order=order, cursor=cursor)
+
+    assert ("WHERE (1 = 1) AND (data->>'field_1', data->>'id') < ($1, $2)"
+            in connection.fetch_query)
+    assert connection.fetch_args == ('a', '0', 2)
+
+
 async def test_sql_repository_add(alpha_sql_repository) -> None:
     item = Alpha(id="4", field_1="value_1")
 
@@ -301,6 +517,92 @@ async def test_sql_repository_add_multiple(alpha_sql_repository):
     assert json.loads(args[0][1][0])['field_1'] == 'value_2'
 
 
+async def test_sql_repository_add_returning(alpha_sql_repository):
+    connection = alpha_sql_repository.connector.connection
+    items = [Alpha(id='1'), Alpha(id='2')]
+
+    result = await alpha_sql_repository.add(items, returning='items')
+
+    assert result is items
+    assert connection.fetch_query == ''
+    assert 'RETURNING' not in connection.execute_query
+    assert [json.loads(record[0])['id'] for record in
+            connection.execute_args[0]] == ['1', '2']
+
+    alpha_sql_repository.returning = 'ids'
+    alpha_sql_repository.connector.pool.append(connection)
+    assert await alpha_sql_repository.add(Alpha(id='3')) == ['3']
+
+    with raises(ValueError):
+        await alpha_sql_repository.add(items, returning='rows')
+
+
+async def test_sql_repository_add_copy(alpha_sql_repository):
+    alpha_sql_repository.copy_threshold = 2
+    connection = alpha_sql_repository.connector.connection
+    connection.fetch_result = [{'data': json.dumps({'id': '1'})},
+                               {'data': json.dumps({'id': '2'})}]
+    events: List[Any] = []
+
+    class MockTransaction:
+        async def __aenter__(self) -> None:
+            events.append('begin')
+
+        async def __aexit__(self, *args) -> None:
+            events.append('end')
+
+    async def execute(query: str, *args) -> str:
+        events.append(cleandoc(query))
+        return 'INSERT 0 2'
+
+    async def copy_records_to_table(table_name, *, records, columns):
+        events.append((table_name, [
+            json.loads(record[0])['id'] for record in records], columns))
+        return 'COPY 2'
+
+    connection.transaction = MockTransaction
+    connection.execute = execute
+    connection.copy_records_to_table = copy_records_to_table
+
+    items = await alpha_sql_repository.add(
+        [Alpha(id='1'), Alpha(id='2')])
+
+    staging = events[2][0]
+    assert [item.id for item in items] == ['1', '2']
+    assert staging.startswith('alphas_staging_')
+    assert events == [
+        'begin',
+        f'CREATE TEMPORARY TABLE {staging} (data jsonb) ON COMMIT DROP',
+        (staging, ['1', '2'], ['data']), f'DROP TABLE {staging}', 'end']
+    assert f"SELECT data\n    FROM {staging}" in cleandoc(
+        connection.fetch_query)
+    assert connection.fetch_query.strip().endswith('RETURNING *;')
+
+    events.clear()
+    alpha_sql_repository.connector.pool.append(connection)
+    assert await alpha_sql_repository.upsert(
+        [Alpha(id='1'), Alpha(id='2')]) == 2
+    assert events[2][0] != staging
+    assert events[-3].endswith("- 'created_at' - 'created_by'\n;")
+
+
+async def test_sql_repository_upsert(alpha_sql_repository):
+    alpha_sql_repository.copy_threshold = 3
+    connection = alpha_sql_repository.connector.connection
+    connection.execute_result = 'INSERT 0 2'
+
+    count = await alpha_sql_repository.upsert(
+        [Alpha(id='1'), Alpha(id='2')])
+
+    assert count == 2
+    assert 'FROM unnest($1::public.alphas[]) AS d' in (
+        connection.execute_query)
+    assert 'RETURNING' not in connection.execute_query
+    assert [json.loads(record[0])['id'] for record in
+            connection.execute_args[0]] == ['1', '2']
+    assert await alpha_sql_repository.upsert([]) == 0
+
+
 async def test_sql_repository_search_one_to_many(
         alpha_sql_repository, beta_sql_repository):
     alpha_sql_repository.connector.connection.fetch_result = [
@@ -396,10 +698,10 @@ async def test_sql_repository_remove_true(alpha_sql_repository):
     assert cleandoc(connection.execute_query) == cleandoc(
         """
         DELETE FROM public.alphas
-        WHERE (data->>'id') IN ($1)
+        WHERE (data->>'id') = ANY($1::text[])
         """)
     args = connection.execute_args
-    assert args == ('5',)
+    assert args == (['5'],)
 
 
 async def test_sql_repository_remove_false(alpha_sql_repository):
@@ -414,10 +716,152 @@ async def test_sql_repository_remove_false(alpha_sql_repository):
     assert cleandoc(connection.execute_query) == cleandoc(
         """
         DELETE FROM public.alphas
-        WHERE (data->>'id') IN ($1)
+        WHERE (data->>'id') = ANY($1::text[])
         """)
     args = connection.execute_args
-    assert args == ('6',)
+    assert args == (['6'],)
+
+
+async def test_sql_repository_remove_batches(alpha_sql_repository):
+    alpha_sql_repository.batch_size = 2
+    connection = alpha_sql_repository.connector.connection
+    executed: List[Tuple] = []
+
+    async def execute(query: str, *args) -> str:
+        executed.append(args)
+        return 'DELETE 0'
+
+    connection.execute = execute
+
+    deleted = await alpha_sql_repository.remove(
+        [Alpha(id=str(i)) for i in range(5)])
+
+    assert deleted is False
+    assert executed == [(['0', '1'],), (['2', '3'],), (['4'],)]
+
+
+async def test_sql_repository_concurrent_batches(alpha_sql_repository):
+    alpha_sql_repository.batch_size = 2
+    alpha_sql_repository.concurrency = 2
+    connector = alpha_sql_repository.connector
+    connections = [connector.connection, type(connector.connection)()]
+    connector.pool = list(connections)
+    fetched: List[Tuple] = []
+    running: List[Any] = []
+
+    for connection in connections:
+        async def fetch(query: str, *args, connection=connection) -> List:
+            assert connection not in running
+            running.append(connection)
+            await sleep(0.01)
+            running.remove(connection)
+            fetched.append((connection, args[0]))
+            return [{'data': json.dumps({'id': id})} for id in args[0]]
+
+        connection.fetch = fetch
+
+    items = await alpha_sql_repository.find([str(i) for i in range(5)])
+
+    assert [item.id for item in items] == ['0', '1', '2', '3', '4']
+    assert sorted(ids for _, ids in fetched) == [
+        ['0', '1'], ['2', '3'], ['4']]
+    assert {id(connection) for connection, _ in fetched} == {
+        id(connection) for connection in connections}
+    assert connector.pool == []
+
+
+async def test_sql_repository_serial_write_batches(alpha_sql_repository):
+    alpha_sql_repository.batch_size = 2
+    alpha_sql_repository.concurrency = 2
+    connector = alpha_sql_repository.connector
+    other = type(connector.connection)()
+    connector.pool.insert(0, other)
+    executed: List[List[str]] = []
+
+    async def execute(query: str, *args) -> str:
+        executed.append(args[0])
+        return f'DELETE {len(args[0])}'
+
+    connector.connection.execute = execute
+
+    assert await alpha_sql_repository.remove(
+        [Alpha(id=str(i)) for i in range(5)]) is True
+    assert executed == [['0', '1'], ['2', '3'], ['4']]
+    assert connector.pool == [other]
+
+
+async def test_sql_repository_concurrent_batches_failure(
+        alpha_sql_repository):
+    alpha_sql_repository.batch_size = 1
+    alpha_sql_repository.concurrency = 2
+    connector = alpha_sql_repository.connector
+    failing, slow = connector.connection, type(connector.connection)()
+    connector.pool = [slow, failing]
+    cancelled: List[bool] = []
+
+    async def fail(query: str, *args) -> List:
+        raise RuntimeError('connection lost')
+
+    async def wait(query: str, *args) -> List:
+        try:
+            await sleep(1)
+        except BaseException:
+            cancelled.append(True)
+            raise
+        return []
+
+    failing.fetch, slow.fetch = fail, wait
+
+    with raises(RuntimeError):
+        await alpha_sql_repository.find(['1', '2', '3'])
+
+    assert cancelled == [True]
+
+
+async def test_sql_repository_scoped_connection_batches(
+        alpha_sql_repository):
+    alpha_sql_repository.batch_size = 2
+    alpha_sql_repository.concurrency = 4
+    connector = alpha_sql_repository.connector
+    connection = connector.connection
+    executed: List[List[str]] = []
+    running: List[Any] = []
+
+    async def get(*args, **kwargs) -> Any:
+        return connection
+
+    async def execute(query: str, *args) -> str:
+        assert not running
+        running.append(args[0])
+        await sleep(0)
+        running.pop()
+        executed.append(args[0])
+        return 'DELETE 1'
+
+    connector.get = get
+    connection.execute = execute
+
+    assert await alpha_sql_repository.remove(
+        [Alpha(id=str(i)) for i in range(5)]) is True
+    assert executed == [['0', '1'], ['2', '3'], ['4']]
+
+
+async def test_sql_repository_find_batches(alpha_sql_repository):
+    alpha_sql_repository.batch_size = 2
+    connection = alpha_sql_repository.connector.connection
+    fetched: List[Tuple] = []
+
+    async def fetch(query: str, *args) -> List[Any]:
+        fetched.append(args)
+        return [{'data': json.dumps({'id': id})} for id in args[0]
+                if id != '2']
+
+    connection.fetch = fetch
+
+    items = await alpha_sql_repository.find(['0', '1', '2'])
+
+    assert [item and item.id for item in items] == ['0', '1', None]
+    assert fetched == [(['0', '1'],), (['2'],)]
 
 
 async def test_sql_repository_remove_empty(alpha_sql_repository):
@@ -458,3 +902,211 @@ async def test_sql_repository_count_domain(alpha_sql_repository):
         """)
     args = connection.fetch_args
     assert args == ("value_3",)
+
+
+async def test_sql_repository_prepared_statements(alpha_sql_repository):
+    class MockStatement:
+        def __init__(self, query: str, connection) -> None:
+            self.query = query
+            self.connection = connection
+
+        async def fetch(self, *args) -> List[Any]:
+            return await self.connection.fetch(self.query, *args)
+
+    connection = alpha_sql_repository.connector.connection
+    prepared: List[str] = []
+
+    async def prepare(query: str) -> MockStatement:
+        prepared.append(query)
+        return MockStatement(query, connection)
+
+    connection.prepare = prepare
+    connector = alpha_sql_repository.connector
+    connector.get = lambda *args, **kwargs: sleep(0, connection)
+    alpha_sql_repository.statement_cache_size = 2
+
+    connection.fetch_result = [{'count': 1}]
+    for value in ('value_1', 'value_2', 'value_3'):
+        assert await alpha_sql_repository.count(
+            [('field_1', '=', value)]) == 1
+        assert connection.fetch_args == (value,)
+    await alpha_sql_repository.count()
+
+    assert len(prepared) == 2
+    assert alpha_sql_repository.prepare_hits == 2
+    assert alpha_sql_repository.prepare_misses == 2
+
+    connection.fetch_result = []
+    await alpha_sql_repository.search([], limit=1)
+    await alpha_sql_repository.search([], limit=1)
+    await alpha_sql_repository.count([('field_1', '=', 'value_1')])
+
+    assert len(prepared) == 4
+    assert len(alpha_sql_repository.statements[connection]) == 2
+
+
+async def test_sql_repository_prepared_statement_pages(alpha_sql_repository):
+    class MockStatement:
+        async def fetch(self, *args) -> List[Any]:
+            return []
+
+    class MockProxy:
+        __slots__ = ('_con',)
+
+        def __init__(self, connection) -> None:
+            self._con = connection
+
+        async def prepare(self, query: str) -> MockStatement:
+            return MockStatement()
+
+    connection = alpha_sql_repository.connector.connection
+    alpha_sql_repository.connector.get = lambda *args, **kwargs: sleep(
+        0, MockProxy(connection))
+    alpha_sql_repository.statement_cache_size = 8
+
+    for page in range(5):
+        await alpha_sql_repository.search(
+            [('field_1', '=', 'value_1')], limit=10, offset=10 * page)
+
+    assert alpha_sql_repository.prepare_misses == 2
+    assert alpha_sql_repository.prepare_hits == 3
+    assert len(alpha_sql_repository.statements[connection]) == 2
+
+
+async def test_sql_repository_prepared_statement_error(alpha_sql_repository):
+    class FailingStatement:
+        async def fetch(self, *args) -> List[Any]:
+            raise RuntimeError('cached plan must not change result type')
+
+    connection = alpha_sql_repository.connector.connection
+
+    async def prepare(query: str) -> FailingStatement:
+        return FailingStatement()
+
+    connection.prepare = prepare
+    alpha_sql_repository.statement_cache_size = 8
+
+    with raises(RuntimeError):
+        await alpha_sql_repository.count()
+
+    assert len(alpha_sql_repository.statements[connection]) == 0
+
+
+async def test_sql_repository_statement_cache_disabled(alpha_sql_repository):
+    connection = alpha_sql_repository.connector.connection
+
+    async def prepare(query: str) -> None:
+        raise AssertionError('Statements must not be prepared')
+
+    connection.prepare = prepare
+    connection.fetch_result = [{'count': 3}]
+
+    assert await alpha_sql_repository.count() == 3
+    assert alpha_sql_repository.prepare_misses == 0
+
+
+async def test_sql_repository_search_path(alpha_sql_repository):
+    connection = alpha_sql_repository.connector.connection
+    connector = alpha_sql_repository.connector
+    connector.get = lambda *args, **kwargs: sleep(0, connection)
+    alpha_sql_repository.search_path = True
+    alpha_sql_repository.locator = DefaultLocator('tenant_1')
+
+    await alpha_sql_repository.search([('field_1', '=', 'value_1')])
+
+    assert connection.execute_query == (
+        "SELECT set_config('search_path', $1, false)")
+    assert connection.execute_args == ('tenant_1',)
+    assert cleandoc(connection.fetch_query) == cleandoc(
+        """
+        SELECT data
+        FROM alphas
+        WHERE (data->>'field_1')::text = $1
+
+        ORDER BY data->>'created_at' DESC NULLS LAST
+        """)
+    query = connection.fetch_query
+
+    alpha_sql_repository.locator = DefaultLocator('tenant_2')
+    await alpha_sql_repository.search([('field_1', '=', 'value_2')])
+
+    assert connection.execute_args == ('tenant_2',)
+    assert connection.fetch_query == query
+
+    await alpha_sql_repository.add(Alpha(id='4'))
+    assert 'INSERT INTO alphas(data)' in connection.fetch_query
+    assert 'unnest($1::alphas[])' in connection.fetch_query
+
+    connection.execute_result = 'DELETE 1'
+    assert await alpha_sql_repository.remove(Alpha(id='4')) is True
+    assert 'DELETE FROM alphas\n' in connection.execute_query
+
+
+async def test_sql_repository_search_path_changes(alpha_sql_repository):
+    connection = alpha_sql_repository.connector.connection
+    connector = alpha_sql_repository.connector
+    connector.get = lambda *args, **kwargs: sleep(0, connection)
+    alpha_sql_repository.search_path = True
+    alpha_sql_repository.locator = DefaultLocator('tenant_1')
+    executed: List[Tuple] = []
+
+    async def execute(query: str, *args) -> str:
+        executed.append(args)
+        return ''
+
+    connection.execute = execute
+
+    await alpha_sql_repository.search([])
+    await alpha_sql_repository.count()
+    assert executed == [('tenant_1',)]
+
+    alpha_sql_repository.locator = DefaultLocator('tenant_2')
+    await alpha_sql_repository.search([])
+    alpha_sql_repository.locator = DefaultLocator('tenant_1')
+    await alpha_sql_repository.search([])
+    assert executed == [('tenant_1',), ('tenant_2',), ('tenant_1',)]
+
+    other = type(connection)()
+    other.execute = execute
+    connector.get = lambda *args, **kwargs: sleep(0, other)
+    await alpha_sql_repository.search([])
+    assert executed[-1] == ('tenant_1',) and len(executed) == 4
+
+    other.is_in_transaction = lambda: True
+    alpha_sql_repository.locator = DefaultLocator('tenant_2')
+    await alpha_sql_repository.search([])
+    await alpha_sql_repository.search([])
+    assert executed[-2:] == [('tenant_2',), ('tenant_2',)]
+
+
+async def test_sql_repository_ensure_indexes(alpha_sql_repository):
+    connection = alpha_sql_repository.connector.connection
+    executed: List[str] = []
+
+    async def execute(query: str, *args) -> str:
+        executed.append(query)
+        return ''
+
+    connection.execute = execute
+    connection.fetch_result = [{'relname': 'alphas_field_1_text_index'}]
+    alpha_sql_repository.indexes = [
+        SqlIndex.of('field_1'), SqlIndex('amount', 'integer', unique=True)]
+
+    names = await alpha_sql_repository.ensure_indexes()
+
+    assert names == ['alphas_field_1_text_index',
+                     'alphas_amount_integer_index']
+    assert connection.fetch_args == ('public', names)
+    assert executed == [
+        "DROP INDEX CONCURRENTLY IF EXISTS "
+        "public.alphas_field_1_text_index",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS alphas_field_1_text_index "
+        "ON public.alphas USING btree (((data->>'field_1')::text))",
+        "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS "
+        "alphas_amount_integer_index ON public.alphas "
+        "USING btree (((data->>'amount')::integer))"]
+
+
+async def test_sql_repository_ensure_no_indexes(alpha_sql_repository):
+    assert await alpha_sql_repository.ensure_indexes() == []
+    assert alpha_sql_repository.connector.connection.fetch_query == ''
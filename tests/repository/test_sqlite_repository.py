@@ -0,0 +1,164 @@
+import sqlite3
+import asyncio
+from pytest import fixture, mark
+from modelark.common import Entity, DefaultLocator
+from modelark.repository import Repository, SqliteRepository
+
+
+pytestmark = mark.asyncio
+
+
+class Alpha(Entity):
+    def __init__(self, **attributes) -> None:
+        super().__init__(**attributes)
+        self.field_1 = attributes.get('field_1', '')
+        self.amount = attributes.get('amount', 0)
+        self.tags = attributes.get('tags', [])
+
+
+class Beta(Entity):
+    def __init__(self, **attributes) -> None:
+        super().__init__(**attributes)
+        self.alpha_id = attributes.get('alpha_id', '')
+
+
+def test_sqlite_repository_implementation() -> None:
+    assert issubclass(SqliteRepository, Repository)
+
+
+@fixture
+def alpha_sqlite_repository(tmp_path) -> SqliteRepository[Alpha]:
+    class AlphaSqliteRepository(SqliteRepository[Alpha]):
+        model = Alpha
+
+    repository = AlphaSqliteRepository(
+        str(tmp_path), 'alphas', Alpha, locator=DefaultLocator('origin'),
+        indexes=['field_1'])
+    asyncio.run(repository.add([
+        Alpha(id='1', field_1='value_1', amount=10, tags=['a'],
+              created_at=3),
+        Alpha(id='2', field_1='value_2', amount=20, tags=['a', 'b'],
+              created_at=2),
+        Alpha(id='3', field_1='Value_3', amount=30, created_at=1)
+    ]))
+    yield repository
+    asyncio.run(repository.close())
+
+
+@fixture
+def beta_sqlite_repository(tmp_path) -> SqliteRepository[Beta]:
+    class BetaSqliteRepository(SqliteRepository[Beta]):
+        model = Beta
+
+    repository = BetaSqliteRepository(
+        str(tmp_path), 'betas', Beta, locator=DefaultLocator('origin'))
+    asyncio.run(repository.add([
+        Beta(id='1', alpha_id='1'), Beta(id='2', alpha_id='1'),
+        Beta(id='3', alpha_id='2')]))
+    yield repository
+    asyncio.run(repository.close())
+
+
+async def test_sqlite_repository_add(alpha_sqlite_repository):
+    items = await alpha_sqlite_repository.add(
+        [Alpha(id='4', field_1='value_4'),
+         Alpha(id='1', field_1='updated', created_at=99)])
+
+    assert [item.id for item in items] == ['4', '1']
+    assert items[1].field_1 == 'updated'
+    assert items[1].created_at == 3
+    assert await alpha_sqlite_repository.count() == 4
+
+
+async def test_sqlite_repository_add_merge(alpha_sqlite_repository):
+    item = Alpha(id='1', field_1='value_1')
+    setattr(item, 'extra', 'kept')
+    await alpha_sqlite_repository.add(item)
+
+    items = await alpha_sqlite_repository.add(
+        Alpha(id='1', field_1='updated'))
+
+    assert items[0].field_1 == 'updated'
+    assert items[0].created_at == 3
+    assert [item.id for item in await alpha_sqlite_repository.search(
+        [('extra', '=', 'kept')])] == ['1']
+
+
+async def test_sqlite_repository_search(alpha_sqlite_repository):
+    cases = [
+        ([], ['1', '2', '3']),
+        ([('field_1', '=', 'value_1')], ['1']),
+        ([('amount', '>=', 20)], ['2', '3']),
+        ([('id', 'in', ['1', '3', '9'])], ['1', '3']),
+        ([('field_1', 'like', 'value%')], ['1', '2']),
+        ([('field_1', 'ilike', 'value%')], ['1', '2', '3']),
+        ([('tags', 'contains', 'b')], ['2']),
+        (['|', ('id', '=', '1'), ('id', '=', '2'), ('amount', '>', 10)],
+         ['1', '2']),
+        ([('amount', '>', 10), '|', ('id', '=', '1'), ('id', '=', '2')],
+         ['2']),
+        (['!', '|', ('id', '=', '1'), ('id', '=', '2')], ['3'])
+    ]
+    for domain, expected in cases:
+        items = await alpha_sqlite_repository.search(domain, order='id')
+        assert [item.id for item in items] == expected, domain
+
+
+async def test_sqlite_repository_search_order_and_pagination(
+        alpha_sqlite_repository):
+    items = await alpha_sqlite_repository.search([])
+    assert [item.id for item in items] == ['1', '2', '3']
+
+    items = await alpha_sqlite_repository.search(
+        [], limit=2, offset=1, order='amount desc')
+    assert [item.id for item in items] == ['2', '1']
+
+    items = await alpha_sqlite_repository.search([], offset=2, order='id')
+    assert [item.id for item in items] == ['3']
+
+
+async def test_sqlite_repository_remove(alpha_sqlite_repository):
+    assert await alpha_sqlite_repository.remove(
+        [Alpha(id='1'), Alpha(id='9')]) is True
+    assert await alpha_sqlite_repository.remove(Alpha(id='1')) is False
+    assert await alpha_sqlite_repository.remove([]) is False
+    assert await alpha_sqlite_repository.count() == 2
+
+
+async def test_sqlite_repository_count(alpha_sqlite_repository):
+    assert await alpha_sqlite_repository.count(
+        [('amount', '<', 30)]) == 2
+
+
+async def test_sqlite_repository_find_and_join(
+        alpha_sqlite_repository, beta_sqlite_repository):
+    items = await alpha_sqlite_repository.find(['3', '7'])
+    assert [item and item.id for item in items] == ['3', None]
+
+    joined = await alpha_sqlite_repository.join(
+        [('id', 'in', ['1', '2'])], beta_sqlite_repository)
+    assert sorted((alpha.id, sorted(beta.id for beta in betas))
+                  for alpha, betas in joined) == [
+        ('1', ['1', '2']), ('2', ['3'])]
+
+
+async def test_sqlite_repository_database(alpha_sqlite_repository):
+    path = alpha_sqlite_repository.database_path
+    assert path.name == 'origin.sqlite3'
+
+    with sqlite3.connect(str(path)) as connection:
+        assert connection.execute(
+            'PRAGMA journal_mode').fetchone() == ('wal',)
+        plan = ' '.join(row[-1] for row in connection.execute(
+            "EXPLAIN QUERY PLAN SELECT data FROM alphas "
+            "WHERE json_extract(data, '$.field_1') = ?", ('value_1',)))
+    assert 'alphas_field_1_index' in plan
+
+
+async def test_sqlite_repository_locations(alpha_sqlite_repository):
+    alpha_sqlite_repository.locator = DefaultLocator('other', 'zone')
+    assert await alpha_sqlite_repository.count() == 0
+    await alpha_sqlite_repository.add(Alpha(id='5'))
+    assert await alpha_sqlite_repository.count() == 1
+
+    assert alpha_sqlite_repository.database_path.parent.name == 'zone'